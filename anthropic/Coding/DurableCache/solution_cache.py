@@ -1,6 +1,7 @@
 import os
 import json
 import pickle
+import time
 
 class InMemoryCacheFlawed:
     """
@@ -18,9 +19,15 @@ class InMemoryCacheFlawed:
         pass
         
 class DurableCache:
-    def __init__(self, filename="cache_wal.jsonl"):
+    def __init__(self, filename="cache_wal.jsonl", clock=time.time, wheel=None):
         self.filename = filename
         self.store = {}
+        self.expiry = {}  # key -> absolute expiry time, for keys set with a ttl
+        self.clock = clock
+        # Optional timer for proactive expiry: anything with schedule(key, t),
+        # cancel(key) and advance(now) -> expired keys, e.g.
+        # timing_wheel.HierarchicalTimingWheel(tick=1.0)
+        self.wheel = wheel
         self._recover()
 
     def _recover(self):
@@ -30,40 +37,87 @@ class DurableCache:
             return
 
         print(f"Recovering from {self.filename}...")
+        now = self.clock()
         try:
             with open(self.filename, 'r') as f:
                 for line in f:
                     entry = json.loads(line)
-                    # {type: "set", key: "...", value: "..."}
-                    if entry['op'] == 'set':
+                    # {type: "set", key: "...", value: "...", expires: ...}
+                    expires = entry.get('expires')
+                    if entry['op'] == 'set' and (expires is None or expires > now):
                         self.store[entry['key']] = entry['value']
-                    elif entry['op'] == 'delete':
-                        if entry['key'] in self.store:
-                            del self.store[entry['key']]
+                        if expires is None:
+                            self.expiry.pop(entry['key'], None)
+                        else:
+                            self.expiry[entry['key']] = expires
+                    else:
+                        # A delete, or a set that has expired since: the key is gone either way
+                        self.store.pop(entry['key'], None)
+                        self.expiry.pop(entry['key'], None)
+            if self.wheel is not None:
+                for key, expires in self.expiry.items():
+                    self.wheel.schedule(key, expires)
             print(f"Restored {len(self.store)} items.")
         except Exception as e:
             print(f"Recovery failed: {e}")
 
-    def _append_to_log(self, op: str, key: str, value=None):
+    def _append_to_log(self, op: str, key: str, value=None, expires=None):
         """Append operation to log file (Naive durability)."""
         entry = {'op': op, 'key': key, 'value': value}
+        if expires is not None:
+            entry['expires'] = expires
         with open(self.filename, 'a') as f:
             f.write(json.dumps(entry) + "\n")
             f.flush()  # Ensure it hits disk immediately if critical
             os.fsync(f.fileno()) # Force flush to disk hardware
 
     def get(self, key):
+        expires = self.expiry.get(key)
+        if expires is not None and expires <= self.clock():
+            # Lazy expiry: the logged expiry time already drops it on recovery
+            self._forget(key)
+            return None
         return self.store.get(key)
     
-    def set(self, key, value):
+    def set(self, key, value, ttl=None):
+        """Stores value; with ttl, for that many seconds only."""
         self.store[key] = value
-        self._append_to_log('set', key, value)
+        expires = None
+        if ttl is not None:
+            expires = self.clock() + ttl
+            self.expiry[key] = expires
+            if self.wheel is not None:
+                self.wheel.schedule(key, expires)
+        elif self.expiry.pop(key, None) is not None and self.wheel is not None:
+            self.wheel.cancel(key)
+        self._append_to_log('set', key, value, expires)
     
     def delete(self, key):
         if key in self.store:
-            del self.store[key]
+            self._forget(key)
             self._append_to_log('delete', key)
 
+    def _forget(self, key):
+        del self.store[key]
+        if self.expiry.pop(key, None) is not None and self.wheel is not None:
+            self.wheel.cancel(key)
+
+    def expire(self, now=None):
+        """
+        Removes every expired key. Returns how many were removed.
+
+        With a wheel this costs O(1) per expired key; without one it scans all keys with a ttl.
+        """
+        now = self.clock() if now is None else now
+        if self.wheel is not None:
+            expired = self.wheel.advance(now)
+        else:
+            expired = [key for key, expires in self.expiry.items() if expires <= now]
+        for key in expired:
+            del self.store[key]
+            del self.expiry[key]
+        return len(expired)
+
     # --- Helper for generating keys from function args ---
     @staticmethod
     def make_key(func_name, args, kwargs):
@@ -103,6 +157,13 @@ if __name__ == "__main__":
     # Simulate restart by creating new instance
     cache2 = DurableCache("test_cache.db")
     print(f"Recovered value: {cache2.get(k1)}")
+
+    # 3. TTL Test
+    cache2.set("session", "token", ttl=0.05)
+    print(f"Before expiry: {cache2.get('session')}")
+    time.sleep(0.06)
+    print(f"After expiry: {cache2.get('session')}") # None
+    print(f"After restart: {DurableCache('test_cache.db').get('session')}") # None
     
     # Cleanup
     try: os.remove("test_cache.db") 
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import unittest
+
+from solution_cache import DurableCache
+
+# timing_wheel lives at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from timing_wheel import HierarchicalTimingWheel
+
+class TestDurableCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "cache_wal.jsonl")
+        self.now = [1000.0]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def open(self, wheel=False):
+        timer = HierarchicalTimingWheel(1.0, start=self.now[0]) if wheel else None
+        return DurableCache(self.filename, clock=lambda: self.now[0], wheel=timer)
+
+    def test_ttl_lazy_expiry_and_recovery(self):
+        cache = self.open()
+        cache.set("short", 1, ttl=5)
+        cache.set("plain", 2)
+        cache.set("long", 3, ttl=60)
+        cache.set("again", 4, ttl=60)
+        cache.set("again", 5, ttl=5) # The newer, shorter ttl wins
+        self.assertEqual(cache.get("short"), 1)
+
+        self.now[0] = 1010.0
+        self.assertIsNone(cache.get("short"))
+        self.assertNotIn("short", cache.store)
+
+        recovered = self.open()
+        self.assertEqual(recovered.store, {"plain": 2, "long": 3})
+        self.assertEqual(recovered.expiry, {"long": 1060.0})
+        self.assertIsNone(recovered.get("again"))
+
+        # A set without ttl clears the old expiry, also across a restart
+        recovered.set("long", 6)
+        self.now[0] = 1100.0
+        self.assertEqual(self.open().store, {"plain": 2, "long": 6})
+
+    def test_expire(self):
+        for wheel in (False, True):
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            self.now[0] = 1000.0
+            cache = self.open(wheel)
+            for i in range(20):
+                cache.set(i, i, ttl=1 + i % 4)
+            cache.set(0, "kept") # No ttl any more
+            cache.delete(1)
+            cache.set("plain", "p")
+
+            self.now[0] = 1002.5
+            # ttl 1 and 2 are due: i % 4 in (0, 1), less the two above
+            self.assertEqual(cache.expire(), 8, wheel)
+            self.assertEqual(sorted(k for k in cache.store if k != "plain"),
+                             [0] + [i for i in range(20) if i % 4 >= 2])
+            self.assertEqual(cache.expire(), 0)
+
+            self.assertEqual(cache.expire(1010.0), 10)
+            self.assertEqual(cache.store, {0: "kept", "plain": "p"})
+            self.assertEqual(cache.expiry, {})
+            self.now[0] = 1010.0
+            self.assertEqual(self.open(wheel).store, {0: "kept", "plain": "p"})
+
+if __name__ == '__main__':
+    unittest.main()
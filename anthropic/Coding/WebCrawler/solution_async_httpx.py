@@ -11,7 +11,7 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("httpcore").setLevel(logging.WARNING)
 
 class AsyncCrawler:
-    def __init__(self, start_url: str, max_concurrency: int = 5, limit: int = 50, output_file: str = None):
+    def __init__(self, start_url: str, max_concurrency: int = 5, limit: int = 50, output_file: str = None, rate_limiter=None):
         self.start_url = start_url
         self.host = urlparse(start_url).netloc
         self.limit = limit
@@ -20,6 +20,9 @@ class AsyncCrawler:
         self.sem = asyncio.Semaphore(max_concurrency)
         self.visited = set()
         self.client = None
+        # Optional per-host throttle: any object with `async acquire(host)`,
+        # e.g. rate_limiter.AsyncRateLimiter(SlidingLogLimiter(5, 1000))
+        self.rate_limiter = rate_limiter
 
     async def log_found(self, url: str):
         pass
@@ -29,6 +32,9 @@ class AsyncCrawler:
 
     async def get_all_links(self, url: str) -> list:
         html = ""
+        if self.rate_limiter is not None:
+            # Wait before taking a semaphore slot so throttled hosts don't block others
+            await self.rate_limiter.acquire(urlparse(url).netloc)
         async with self.sem:
             try:
                 response = await self.client.get(url, timeout=10.0, follow_redirects=True)
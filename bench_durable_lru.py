@@ -0,0 +1,231 @@
+import argparse
+import marshal
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+
+from durable_lru import PersistentLRUCache, ShardedPersistentLRUCache
+
+
+def run_ops(cache, ops, keys, seed=0):
+    """Mixed workload: 50% puts, 50% gets over a fixed key space."""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for i in range(ops):
+        key = f"key-{rng.randrange(keys)}"
+        if i % 2:
+            cache.get(key)
+        else:
+            cache.put(key, i)
+    cache.flush()
+    return ops / (time.perf_counter() - start)
+
+
+def bench_group_commit(ops, keys):
+    """ops/sec for each durability level, one record per batch vs group commit."""
+    print(f"{ops:,} ops over {keys:,} keys")
+    print(f"  {'durability':<10} {'batch':>6} {'ops/sec':>12}")
+    for durability in ("none", "flush", "fsync"):
+        for batch_size in (1, 64):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                # fsync per record is slow enough that a tenth of the ops tells the story
+                n = ops // 10 if durability == "fsync" and batch_size == 1 else ops
+                with PersistentLRUCache(keys, os.path.join(tmpdir, "cache.jsonl"),
+                                        durability=durability, batch_size=batch_size) as cache:
+                    rate = run_ops(cache, n, keys)
+            print(f"  {durability:<10} {batch_size:>6} {rate:>12,.0f}")
+
+
+def bench_recovery(records, keys):
+    """Startup time replaying the same workload from JSONL and binary logs."""
+    print(f"Recovery of {records:,} records over {keys:,} keys")
+    print(f"  {'format':<16} {'log MB':>8} {'seconds':>8} {'records/sec':>12}")
+    for name, options in (("jsonl", {}),
+                          ("binary/pickle", {"log_format": "binary", "serializer": pickle}),
+                          ("binary/marshal", {"log_format": "binary", "serializer": marshal})):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "cache.log")
+            with PersistentLRUCache(keys, filename, durability="none", batch_size=1024, **options) as cache:
+                run_ops(cache, records, keys)
+            start = time.perf_counter()
+            PersistentLRUCache(keys, filename, **options).close()
+            elapsed = time.perf_counter() - start
+            size = os.path.getsize(filename) / 2**20
+        print(f"  {name:<16} {size:>8.1f} {elapsed:>8.3f} {records / elapsed:>12,.0f}")
+
+
+def bench_snapshot_recovery(ops, keys):
+    """Restart time as the log grows: full replay vs snapshot + tail."""
+    print(f"Restart time over {keys:,} keys (binary log, snapshot every {keys:,} ops)")
+    print(f"  {'log ops':>10} {'full replay':>12} {'snapshot':>10}")
+    for n in (ops // 4, ops, 4 * ops):
+        times = []
+        for snapshot_every in (None, keys):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                filename = os.path.join(tmpdir, "cache.log")
+                with PersistentLRUCache(keys, filename, durability="none", batch_size=1024,
+                                        log_format="binary", snapshot_every=snapshot_every) as cache:
+                    run_ops(cache, n, keys)
+                start = time.perf_counter()
+                PersistentLRUCache(keys, filename, log_format="binary").close()
+                times.append(time.perf_counter() - start)
+        print(f"  {n:>10,} {times[0]:>11.3f}s {times[1]:>9.3f}s")
+
+
+def bench_reads(ops, keys):
+    """get() throughput with every read logged vs recency checkpoints only."""
+    print(f"{ops:,} reads over {keys:,} cached keys")
+    print(f"  {'mode':<22} {'durability':<10} {'batch':>6} {'reads/sec':>12} {'log bytes/read':>15}")
+    key_list = [f"key-{k}" for k in random.Random(3).choices(range(keys), k=ops)]
+    for log_gets in (True, False):
+        for durability, batch_size in (("flush", 1), ("flush", 64), ("fsync", 64)):
+            with tempfile.TemporaryDirectory() as tmpdir:
+                filename = os.path.join(tmpdir, "cache.log")
+                with PersistentLRUCache(keys, filename, durability=durability, batch_size=batch_size,
+                                        log_format="binary", log_gets=log_gets) as cache:
+                    for k in range(keys):
+                        cache.put(f"key-{k}", k)
+                    cache.flush()
+                    size = os.path.getsize(filename)
+                    get = cache.get
+                    start = time.perf_counter()
+                    for key in key_list:
+                        get(key)
+                    cache.flush()
+                    elapsed = time.perf_counter() - start
+                    written = os.path.getsize(filename) - size
+            mode = "log every get" if log_gets else "order checkpoints"
+            print(f"  {mode:<22} {durability:<10} {batch_size:>6} {ops / elapsed:>12,.0f} {written / ops:>15.1f}")
+
+
+def bench_sharded(ops_per_thread, keys):
+    """Total ops/sec from 1, 8 and 32 threads: one shard (one lock) vs 16 shards."""
+    print(f"{ops_per_thread:,} ops per thread over {keys:,} keys (binary log, batch of 16)")
+    print(f"  {'durability':<10} {'threads':>7} {'shards':>7} {'ops/sec':>12}")
+    for durability in ("flush", "fsync"):
+        for threads in (1, 8, 32):
+            for shards in (1, 16):
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    cache = ShardedPersistentLRUCache(keys, os.path.join(tmpdir, "cache.log"), shards=shards,
+                                                      durability=durability, batch_size=16, log_format="binary")
+                    barrier = threading.Barrier(threads + 1)
+
+                    def worker(seed):
+                        rng = random.Random(seed)
+                        key_list = [f"key-{rng.randrange(keys)}" for _ in range(ops_per_thread)]
+                        barrier.wait()
+                        for i, key in enumerate(key_list):
+                            if i % 2:
+                                cache.get(key)
+                            else:
+                                cache.put(key, i)
+
+                    pool = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+                    for thread in pool:
+                        thread.start()
+                    barrier.wait()
+                    start = time.perf_counter()
+                    for thread in pool:
+                        thread.join()
+                    elapsed = time.perf_counter() - start
+                    cache.close()
+                print(f"  {durability:<10} {threads:>7} {shards:>7} {threads * ops_per_thread / elapsed:>12,.0f}")
+
+
+def bench_compaction(keys, value_size=1024):
+    """How long compact() holds up the caller, and put latency while it runs."""
+    print(f"Compaction of {keys:,} live keys with {value_size:,}-byte values (binary log)")
+    print(f"  {'mode':<10} {'caller blocked':>15} {'puts during':>12} {'max put':>10}")
+    for wait in (True, False):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with PersistentLRUCache(keys, os.path.join(tmpdir, "cache.log"), durability="none",
+                                    batch_size=1024, log_format="binary") as cache:
+                value = b"x" * value_size
+                for i in range(2 * keys):
+                    cache.put(i % keys, value)
+                start = time.perf_counter()
+                cache.compact(wait=wait)
+                blocked = time.perf_counter() - start
+
+                puts, worst = 0, 0.0
+                while puts == 0 or (cache._compaction_thread.is_alive() and puts < 10 * keys):
+                    t = time.perf_counter()
+                    cache.put(puts % keys, value)
+                    worst = max(worst, time.perf_counter() - t)
+                    puts += 1
+        mode = "blocking" if wait else "online"
+        print(f"  {mode:<10} {blocked * 1e3:>13.1f}ms {puts:>12,} {worst * 1e3:>8.2f}ms")
+
+
+def bench_expiry(keys, value_size=1024):
+    """Proactive expiry by timing wheel vs scanning every TTL, and recovery of a mostly expired log."""
+    now = [0.0]
+    print(f"Expiry of {keys:,} keys with TTLs spread over 100s, expire() once per 1s tick")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = PersistentLRUCache(keys, os.path.join(tmpdir, "cache.log"), durability="none", batch_size=1024,
+                                   log_format="binary", clock=lambda: now[0])
+        value = b"x" * value_size
+        for i in range(keys):
+            cache.put(i, value, ttl=1 + i % 100)
+        expiry = dict(cache._expiry)
+
+        start = time.perf_counter()
+        for tick in range(1, 102):
+            now[0] = tick
+            cache.expire()
+        wheel = time.perf_counter() - start
+        start = time.perf_counter()
+        for tick in range(1, 102):
+            for key in [key for key, expires in expiry.items() if expires <= tick]:
+                del expiry[key]
+        scan = time.perf_counter() - start
+        print(f"  timing wheel {wheel * 1e3:>8.1f}ms   full scan per tick {scan * 1e3:>8.1f}ms")
+
+        for i in range(keys):
+            cache.put(i, value, ttl=200 if i % 10 == 0 else 10)
+        cache.close()
+        print(f"Recovery of {2 * keys:,} binary records: the rewrites expire at t=111s, except 1 in 10")
+        for at in (105.0, 150.0):
+            now[0] = at
+            label = f"at t={at:.0f}s"
+            start = time.perf_counter()
+            recovered = PersistentLRUCache(keys, cache.filename, log_format="binary", clock=lambda: now[0])
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<13} {elapsed * 1e3:>8.1f}ms  {len(recovered.cache):>8,} entries")
+            recovered.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PersistentLRUCache benchmarks.")
+    parser.add_argument("--ops", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--section", choices=("write", "recovery", "snapshot", "reads", "sharded", "compaction", "expiry", "all"), default="all")
+    args = parser.parse_args()
+
+    if args.section in ("write", "all"):
+        bench_group_commit(args.ops, args.keys)
+
+    if args.section in ("recovery", "all"):
+        bench_recovery(5 * args.ops, args.keys)
+
+    if args.section in ("snapshot", "all"):
+        bench_snapshot_recovery(args.ops, args.keys)
+
+    if args.section in ("reads", "all"):
+        bench_reads(args.ops, args.keys)
+
+    if args.section in ("sharded", "all"):
+        bench_sharded(args.ops // 20, args.keys)
+
+    if args.section in ("compaction", "all"):
+        bench_compaction(10 * args.keys)
+
+    if args.section in ("expiry", "all"):
+        bench_expiry(10 * args.keys)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import time
+
+import numpy as np
+
+from eviction_policies import POLICIES, BoundedCache, make_policy
+
+
+def object_sizes(keys, seed=0):
+    """Per-key sizes, log-normal and clipped to 10 B .. 10 MB (median ~4 KB)."""
+    rng = np.random.default_rng(seed)
+    return np.clip(rng.lognormal(np.log(4096), 2.0, keys), 10, 10 * 2**20).astype(np.int64)
+
+
+def zipf_trace(n, keys, alpha=0.9, seed=0):
+    """Zipf-distributed requests over keys, the hottest keys scattered over the id space."""
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, keys + 1) ** alpha
+    ranks = rng.choice(keys, n, p=weights / weights.sum())
+    return rng.permutation(keys)[ranks]
+
+
+def scan_trace(n, keys, seed=0):
+    """Zipf traffic with a one-off sequential scan of new keys after every 10k requests."""
+    base = zipf_trace(n, keys, seed=seed)
+    parts, next_key = [], keys
+    for start in range(0, n, 10_000):
+        parts.append(base[start:start + 10_000])
+        parts.append(np.arange(next_key, next_key + 2_000))
+        next_key += 2_000
+    return np.concatenate(parts)[:n]
+
+
+def loop_trace(n, keys):
+    """Cyclic access over keys: the worst case for LRU when keys exceed the cache."""
+    return np.arange(n) % keys
+
+
+def shifting_trace(n, keys, phases=5, seed=0):
+    """Zipf traffic whose hot set moves to fresh keys each phase."""
+    parts = [zipf_trace(n // phases, keys, seed=seed + p) + p * keys for p in range(phases)]
+    return np.concatenate(parts)
+
+
+def load_trace(path):
+    """Reads a trace file: one request per line, "key" or "key size"."""
+    keys, sizes = [], {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            keys.append(fields[0])
+            if len(fields) > 1:
+                sizes[fields[0]] = int(fields[1])
+    return keys, sizes
+
+
+def replay(trace, sizes, policy, max_entries=None, max_bytes=None, expected_entries=1024):
+    """
+    Replays trace through a BoundedCache: get, and put on a miss.
+
+    Args:
+        trace: Sequence of keys.
+        sizes: Mapping (or array) from key to object size in bytes.
+        policy: Policy name.
+        max_entries: Entry budget, or None.
+        max_bytes: Byte budget, or None.
+        expected_entries: Sizing hint for the W-TinyLFU sketch.
+
+    Returns:
+        (hit ratio, byte hit ratio, requests/sec)
+    """
+    cache = BoundedCache(max_entries, max_bytes, sizeof=lambda size: size,
+                         policy=make_policy(policy, expected_entries))
+    get, put = cache.get, cache.put
+    hit_bytes = total_bytes = 0
+    start = time.perf_counter()
+    for key in trace:
+        size = sizes[key]
+        total_bytes += size
+        if get(key, None) is None:
+            put(key, size)
+        else:
+            hit_bytes += size
+    elapsed = time.perf_counter() - start
+    return cache.hit_ratio, hit_bytes / total_bytes, len(trace) / elapsed
+
+
+def report(name, trace, sizes, max_entries=None, max_bytes=None, expected_entries=1024):
+    budget = f"{max_entries:,} entries" if max_entries else f"{max_bytes / 2**20:,.0f} MB"
+    print(f"{name}: {len(trace):,} requests, budget {budget}")
+    print(f"  {'policy':<8} {'hit ratio':>10} {'byte hits':>10} {'requests/sec':>14}")
+    for policy in POLICIES:
+        hits, byte_hits, rate = replay(trace, sizes, policy, max_entries, max_bytes, expected_entries)
+        print(f"  {policy:<8} {hits:>10.1%} {byte_hits:>10.1%} {rate:>14,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eviction policy trace replay.")
+    parser.add_argument("--trace", help="Trace file to replay instead of the synthetic traces.")
+    parser.add_argument("--requests", type=int, default=300_000)
+    parser.add_argument("--keys", type=int, default=50_000)
+    parser.add_argument("--entries", type=int, default=2_000, help="Entry budget.")
+    parser.add_argument("--megabytes", type=int, default=64, help="Byte budget, in MB.")
+    args = parser.parse_args()
+
+    if args.trace:
+        trace, sizes = load_trace(args.trace)
+        if len(sizes) < len(set(trace)):
+            sizes = {key: sizes.get(key, 1) for key in trace}
+        report(args.trace, trace, sizes, max_entries=args.entries, expected_entries=args.entries)
+        if any(size != 1 for size in sizes.values()):
+            report(args.trace, trace, sizes, max_bytes=args.megabytes * 2**20, expected_entries=args.entries)
+        return
+
+    n, keys = args.requests, args.keys
+    traces = {
+        "zipf": zipf_trace(n, keys),
+        "zipf + scans": scan_trace(n, keys),
+        "loop": loop_trace(n, args.entries + args.entries // 10),
+        "shifting hot set": shifting_trace(n, keys),
+    }
+    for name, trace in traces.items():
+        trace = trace.tolist()
+        sizes = object_sizes(max(trace) + 1).tolist()
+        report(name, trace, sizes, max_entries=args.entries, expected_entries=args.entries)
+        report(name, trace, sizes, max_bytes=args.megabytes * 2**20, expected_entries=args.entries)
+
+
+if __name__ == "__main__":
+    main()
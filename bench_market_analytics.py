@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time as timer
+import tracemalloc
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from market_analytics import TradingCalendar, get_market_seconds_between_events
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_market_analytics_baseline.json")
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+EXCHANGE_TZ = ZoneInfo("America/New_York")
+
+
+def weekdays(first, years):
+    days = [first + timedelta(days=i) for i in range(365 * years)]
+    return [d for d in days if d.weekday() < 5]
+
+
+# --- Workloads ---
+# Each workload returns (trading_days, tz, events) with events as datetime pairs.
+
+def intraday_events(n, rng):
+    """Events that open and close within a single session."""
+    days = weekdays(date(2024, 1, 1), 1)
+    events = []
+    for _ in range(n):
+        start = datetime.combine(rng.choice(days), MARKET_OPEN) + timedelta(seconds=rng.randrange(23400))
+        events.append((start, start + timedelta(seconds=rng.randrange(3600))))
+    return days, None, events
+
+
+def multi_week_events(n, rng):
+    """Events spanning one to six weeks of trading days."""
+    days = weekdays(date(2024, 1, 1), 1)
+    events = []
+    for _ in range(n):
+        start = datetime(2024, 1, 1) + timedelta(seconds=rng.randrange(300 * 86400))
+        events.append((start, start + timedelta(days=rng.randrange(7, 43), seconds=rng.randrange(86400))))
+    return days, None, events
+
+
+def tz_aware_events(n, rng):
+    """Exchange-local aware events spanning both 2024 DST transitions."""
+    days = weekdays(date(2024, 1, 1), 1)
+    events = []
+    for _ in range(n):
+        start = datetime(2024, 1, 1, tzinfo=EXCHANGE_TZ) + timedelta(seconds=rng.randrange(350 * 86400))
+        events.append((start, start + timedelta(seconds=rng.randrange(10 * 86400))))
+    return days, EXCHANGE_TZ, events
+
+
+def repetitive_events(n, rng):
+    """Orders opened at the 09:30 auction with a handful of distinct lifetimes."""
+    days = weekdays(date(2024, 1, 1), 1)
+    opens = [datetime.combine(d, MARKET_OPEN) for d in days[:20]]
+    lifetimes = [timedelta(minutes=m) for m in (1, 5, 15, 30, 60)]
+    events = []
+    for _ in range(n):
+        start = rng.choice(opens)
+        events.append((start, start + rng.choice(lifetimes)))
+    return days, None, events
+
+
+def long_calendar_events(n, rng):
+    """Events covering hundreds of trading days on a 20 year calendar."""
+    days = weekdays(date(2005, 1, 1), 20)
+    events = []
+    for _ in range(n):
+        start = datetime(2005, 1, 1) + timedelta(seconds=rng.randrange(18 * 365 * 86400))
+        events.append((start, start + timedelta(days=rng.randrange(100, 700))))
+    return days, None, events
+
+
+WORKLOADS = {
+    "intraday": intraday_events,
+    "multi_week": multi_week_events,
+    "tz_aware": tz_aware_events,
+    "repetitive": repetitive_events,
+    "long_calendar": long_calendar_events,
+}
+
+
+# --- Modes ---
+# Each mode takes (trading_days, tz, events) and returns a list of ints. The
+# calendar is built inside the timed region so its one-off cost is included.
+
+def run_reference(trading_days, tz, events):
+    return get_market_seconds_between_events(events, trading_days, MARKET_OPEN, MARKET_CLOSE)
+
+
+def run_calendar(trading_days, tz, events):
+    calendar = TradingCalendar(trading_days, MARKET_OPEN, MARKET_CLOSE, tz=tz)
+    return [calendar.market_seconds(start, end) for start, end in events]
+
+
+def run_cached(trading_days, tz, events):
+    calendar = TradingCalendar(trading_days, MARKET_OPEN, MARKET_CLOSE, tz=tz, cache_size=4096)
+    return [calendar.market_seconds(start, end) for start, end in events]
+
+
+def run_streaming(trading_days, tz, events):
+    calendar = TradingCalendar(trading_days, MARKET_OPEN, MARKET_CLOSE, tz=tz)
+    return list(calendar.iter_market_seconds(iter(events)))
+
+
+def run_batch(trading_days, tz, epochs):
+    # Takes pre-converted epoch columns: the batch engine's input format
+    calendar = TradingCalendar(trading_days, MARKET_OPEN, MARKET_CLOSE, tz=tz)
+    return calendar.market_seconds_batch(*epochs).tolist()
+
+
+MODES = {
+    "reference": run_reference,
+    "calendar": run_calendar,
+    "cached": run_cached,
+    "streaming": run_streaming,
+    "batch": run_batch,
+}
+
+
+def measure(fn, *args, repeat=1):
+    """
+    Returns (result, seconds, peak traced MB) for fn(*args).
+
+    seconds is the best of repeat timed runs: a single run on a shared
+    machine can be off by 2x, which would drown any real regression.
+    tracemalloc slows allocation-heavy code several times over, so the timed
+    runs and the memory run are separate calls.
+    """
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = timer.perf_counter()
+        result = fn(*args)
+        elapsed = min(elapsed, timer.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20
+
+
+def run_suite(n, reference_n, seed=0, repeat=1):
+    """Times every mode on every workload and checks they agree with the reference."""
+    results = {}
+    for workload, generate in WORKLOADS.items():
+        trading_days, tz, events = generate(n, random.Random(seed))
+        calendar = TradingCalendar(trading_days, MARKET_OPEN, MARKET_CLOSE, tz=tz)
+        epochs = (
+            np.array([calendar.epoch(start) for start, _ in events], dtype=np.int64),
+            np.array([calendar.epoch(end) for _, end in events], dtype=np.int64),
+        )
+        expected = None
+        for mode, fn in MODES.items():
+            # The per-day reference loop is slow on long events, so it runs on a prefix
+            count = min(reference_n, n) if mode == "reference" else n
+            inputs = (epochs[0][:count], epochs[1][:count]) if mode == "batch" else events[:count]
+            output, elapsed, peak_mb = measure(fn, trading_days, tz, inputs, repeat=repeat)
+            if expected is None:
+                expected = output
+            elif output[:len(expected)] != expected:
+                raise AssertionError(f"{mode} disagrees with reference on {workload}")
+            results.setdefault(workload, {})[mode] = {
+                "events": count,
+                "seconds": round(elapsed, 4),
+                "events_per_sec": round(count / elapsed),
+                "peak_mb": round(peak_mb, 2),
+            }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a list of regressions slower than baseline by more than tolerance.
+
+    A benchmark missing from the baseline counts too: otherwise a new mode or
+    workload would never be guarded until someone remembered --save-baseline.
+    """
+    regressions = []
+    for workload, modes in results.items():
+        for mode, stats in modes.items():
+            old = baseline.get("results", {}).get(workload, {}).get(mode)
+            if old is None:
+                regressions.append(f"{workload}/{mode}: missing from the baseline (rerun with --save-baseline)")
+                continue
+            ratio = stats["events_per_sec"] / old["events_per_sec"]
+            if ratio < 1 - tolerance:
+                regressions.append(f"{workload}/{mode}: {stats['events_per_sec']:,} vs baseline {old['events_per_sec']:,} events/sec ({ratio:.0%})")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'workload':<14} {'mode':<10} {'events':>9} {'events/sec':>14} {'peak MB':>9}")
+    for workload, modes in results.items():
+        for mode, stats in modes.items():
+            print(f"{workload:<14} {mode:<10} {stats['events']:>9,} {stats['events_per_sec']:>14,} {stats['peak_mb']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and regression check for market_analytics.")
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--reference-events", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per mode; the fastest counts.")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline file with this run.")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero if any mode regressed against the baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="Allowed fractional slowdown for --check.")
+    args = parser.parse_args()
+
+    results = run_suite(args.events, args.reference_events, repeat=args.repeat)
+    print_table(results)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "numpy": np.__version__,
+                "events": args.events,
+                "reference_events": args.reference_events,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("events") != args.events:
+            # Fixed costs (building the calendar) weigh more on small runs
+            print(f"\nNote: baseline was recorded with --events {baseline.get('events')}")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+import os
+import time as timer
+from datetime import date, time, timedelta
+
+import numpy as np
+
+from market_analytics import TradingCalendar, market_seconds_parallel
+
+
+def build_calendar(years=10):
+    """Weekday calendar starting Jan 1 2015 with a regular 09:30-16:00 session."""
+    first = date(2015, 1, 1)
+    days = [first + timedelta(days=i) for i in range(365 * years)]
+    trading_days = [d for d in days if d.weekday() < 5]
+    return TradingCalendar(trading_days, time(9, 30), time(16, 0))
+
+
+def synthetic_events(calendar, n, seed=0):
+    """Random events up to 30 days long scattered across the calendar."""
+    rng = np.random.default_rng(seed)
+    starts = rng.integers(calendar.opens[0] - 86400, calendar.opens[-1], n, dtype=np.int64)
+    ends = starts + rng.integers(0, 30 * 86400, n, dtype=np.int64)
+    return starts, ends
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of market_seconds_parallel vs number of workers.")
+    parser.add_argument("--events", type=int, default=20_000_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    calendar = build_calendar()
+    starts, ends = synthetic_events(calendar, args.events)
+    expected = calendar.market_seconds_batch(starts, ends)
+
+    print(f"{args.events:,} events, {len(calendar):,} sessions, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>10} {'events/sec':>14}")
+
+    workers = 1
+    while workers <= args.max_workers:
+        start = timer.perf_counter()
+        # One worker runs in-process and is the baseline for the pool rows
+        result = market_seconds_parallel(calendar, starts, ends, workers=workers, chunk_size=args.chunk_size)
+        elapsed = timer.perf_counter() - start
+        assert np.array_equal(result, expected)
+        print(f"{workers:>8} {elapsed:>10.3f} {args.events / elapsed:>14,.0f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
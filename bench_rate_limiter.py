@@ -0,0 +1,149 @@
+import argparse
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from rate_limiter import (
+    ConcurrentRateLimiter,
+    GCRALimiter,
+    SharedMemoryRateLimiter,
+    SlidingLogLimiter,
+    SlidingWindowCounterLimiter,
+    TokenBucketLimiter,
+    solve_rate_limiter,
+    solve_rate_limiter_batch,
+)
+
+ALGORITHMS = (SlidingLogLimiter, SlidingWindowCounterLimiter, TokenBucketLimiter, GCRALimiter)
+
+
+def synthetic_timestamps(n, mean_gap=3, seed=0):
+    """Strictly increasing timestamps with random gaps (1 .. 2 * mean_gap - 1)."""
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.integers(1, 2 * mean_gap, n, dtype=np.int64))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_batch(n, maxRequests, windowSize):
+    """Deque loop vs NumPy batch admission on the same replay log."""
+    ts = synthetic_timestamps(n)
+    ts_list = ts.tolist()
+
+    expected, loop_seconds = timed(solve_rate_limiter, ts_list, maxRequests, windowSize)
+    result, batch_seconds = timed(solve_rate_limiter_batch, ts, maxRequests, windowSize)
+    assert result.tolist() == expected
+
+    print(f"{n:,} timestamps, maxRequests={maxRequests}, windowSize={windowSize}, {result.mean():.1%} allowed")
+    print(f"  {'deque loop':<12} {loop_seconds:>8.3f}s {n / loop_seconds:>16,.0f} decisions/sec")
+    print(f"  {'numpy batch':<12} {batch_seconds:>8.3f}s {n / batch_seconds:>16,.0f} decisions/sec")
+
+
+def bytes_per_key(cls, maxRequests, windowSize, keys):
+    """Traced bytes per key with every key active (nothing evictable)."""
+    limiter = cls(maxRequests, windowSize)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for key in range(keys):
+        # A few requests per key so the sliding log holds several entries
+        for _ in range(3):
+            limiter.allow(key, 0)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / keys
+
+
+def bench_algorithms(n, keys, maxRequests, windowSize):
+    """Decisions/sec and bytes/key for each KeyedRateLimiter algorithm."""
+    rng = np.random.default_rng(1)
+    ts = synthetic_timestamps(n, mean_gap=1).tolist()
+    key_stream = rng.integers(0, keys, n).tolist()
+
+    print(f"{n:,} decisions over {keys:,} keys, maxRequests={maxRequests}, windowSize={windowSize}")
+    print(f"  {'algorithm':<28} {'decisions/sec':>14} {'allowed':>8} {'bytes/key':>10}")
+    for cls in ALGORITHMS:
+        limiter = cls(maxRequests, windowSize)
+        allow = limiter.allow
+        start = time.perf_counter()
+        allowed = sum(allow(key, t) for key, t in zip(key_stream, ts))
+        elapsed = time.perf_counter() - start
+        size = bytes_per_key(cls, maxRequests, windowSize, 100_000)
+        print(f"  {cls.__name__:<28} {n / elapsed:>14,.0f} {allowed / n:>8.1%} {size:>10.0f}")
+
+
+def bench_contention(decisions_per_thread, keys):
+    """Total decisions/sec from 1, 8 and 64 threads: one global lock vs 64 stripes."""
+    print(f"{decisions_per_thread:,} decisions per thread over {keys:,} keys (GCRA, 100 per second)")
+    print(f"  {'threads':>7} {'stripes':>8} {'decisions/sec':>14}")
+    for threads in (1, 8, 64):
+        for stripes in (1, 64):
+            limiter = ConcurrentRateLimiter(lambda: GCRALimiter(100, 1000), stripes=stripes)
+            key_lists = [np.random.default_rng(i).integers(0, keys, decisions_per_thread).tolist() for i in range(threads)]
+            barrier = threading.Barrier(threads + 1)
+
+            def worker(key_list):
+                allow = limiter.allow
+                barrier.wait()
+                for key in key_list:
+                    allow(key)
+
+            pool = [threading.Thread(target=worker, args=(key_list,)) for key_list in key_lists]
+            for thread in pool:
+                thread.start()
+            barrier.wait()
+            start = time.perf_counter()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            print(f"  {threads:>7} {stripes:>8} {threads * decisions_per_thread / elapsed:>14,.0f}")
+
+
+def bench_shared_memory(decisions, keys):
+    """Per-decision latency of the shared-memory table vs the in-process counter."""
+    key_list = [f"key-{k}" for k in np.random.default_rng(2).integers(0, keys, decisions)]
+    shared = SharedMemoryRateLimiter(100, 1000, slots=4 * keys)
+    try:
+        print(f"{decisions:,} decisions over {keys:,} keys")
+        for name, allow in (("SlidingWindowCounterLimiter", SlidingWindowCounterLimiter(100, 1000).allow),
+                            ("SharedMemoryRateLimiter", shared.allow)):
+            start = time.perf_counter()
+            for i, key in enumerate(key_list):
+                allow(key, i)
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<28} {elapsed / decisions * 1e6:>6.2f} us/decision")
+    finally:
+        shared.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter benchmarks.")
+    parser.add_argument("--section", choices=("batch", "algorithms", "contention", "shared", "all"), default="all")
+    parser.add_argument("--timestamps", type=int, default=10_000_000)
+    parser.add_argument("--decisions", type=int, default=1_000_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--per-thread", type=int, default=20_000)
+    args = parser.parse_args()
+
+    if args.section in ("batch", "all"):
+        # Light load (most requests fit), heavy load (most are rejected) and a mix
+        for maxRequests, windowSize in ((100, 200), (10, 1000), (50, 150)):
+            bench_batch(args.timestamps, maxRequests, windowSize)
+
+    if args.section in ("algorithms", "all"):
+        bench_algorithms(args.decisions, args.keys, 10, 60_000)
+
+    if args.section in ("contention", "all"):
+        bench_contention(args.per_thread, args.keys)
+
+    if args.section in ("shared", "all"):
+        bench_shared_memory(args.decisions, args.keys)
+
+
+if __name__ == "__main__":
+    main()
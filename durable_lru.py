@@ -1,105 +1,976 @@
 
+import glob
 import json
+import mmap
 import os
-import shutil
+import pickle
+import struct
+import sys
+import threading
+import time
+import zlib
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from timing_wheel import HierarchicalTimingWheel
 
 # Define the cache filename
 LOG_FILE = "persistent_cache.jsonl"
 SNAPSHOT_FILE = "persistent_cache.snap"
 
+# Durability levels for a flushed batch of log records:
+#   "none":  hand the batch to Python's file buffer (lost if the process dies)
+#   "flush": push it to the OS (survives a process crash, not a power loss)
+#   "fsync": force it to disk (survives both)
+DURABILITY_LEVELS = ("none", "flush", "fsync")
+
+LOG_FORMATS = ("jsonl", "binary")
+
+_CRC32_RESIDUE = 0x2144DF1C
+
+# A snapshot file is this magic, the little-endian log segment number and
+# offset in it that the snapshot covers, then the cache contents as PUT
+# records (oldest first) in the log's own format
+_SNAPSHOT_MAGIC = b"LRUSNAP2"
+_SNAPSHOT_HEADER = len(_SNAPSHOT_MAGIC) + 16
+
+# Stands in, during replay, for the value of an entry that expired while the
+# cache was down
+_EXPIRED = object()
+
+
+def _encode_varint(n):
+    """Unsigned LEB128: 7 bits per byte, high bit set on all but the last."""
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return out
+
+
+def _decode_varint(buf, pos):
+    """Returns (value, next_pos). Raises IndexError if buf ends mid-varint."""
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class JsonlCodec:
+    """One JSON object per line: {"op": ..., "key": ..., "value": ..., "expires": ...}."""
+
+    # No header: every segment starts with the "{" of its first record
+    MAGIC = b""
+
+    def encode(self, op, key, value=None, expires=None):
+        entry = {"op": op, "key": key}
+        if value is not None:
+            entry["value"] = value
+        if expires is not None:
+            entry["expires"] = expires
+        return (json.dumps(entry) + "\n").encode()
+
+    def replay(self, filename, apply, start=0, now=None):
+        """
+        Calls apply(op, key, value, expires) for every readable record from byte start.
+
+        A PUT that expired by now is replayed as an EXPIRED record of its key.
+
+        Returns:
+            The byte length of the log; corrupted lines are skipped, not cut.
+        """
+        with open(filename, "rb") as f:
+            f.seek(start)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # Skip corrupted lines
+                op, expires = record.get("op"), record.get("expires")
+                if expires is not None and now is not None and expires <= now:
+                    apply("EXPIRED", record.get("key"), None, None)
+                else:
+                    apply(op, record.get("key"), record.get("value"), expires)
+        return os.path.getsize(filename)
+
+
+class BinaryCodec:
+    """
+    Compact length-prefixed records:
+
+        opcode (1 byte) | varint key length | varint value length (PUT only)
+        | expiry time (PUTX only, 8-byte little-endian double) | key | value
+        | CRC32 of everything before it (4 bytes, little-endian)
+
+    PUTX is a PUT with an expiry; encode() picks it when expires is given.
+    Every segment starts with MAGIC, which replay skips; segments written
+    before it was added start straight with a record and still replay.
+
+    Keys and values go through serializer, any object with bytes-returning
+    dumps() and a loads() that accepts a memoryview (pickle, marshal, ...).
+    Replay walks a memory map of the log and stops at the first record that
+    is incomplete or fails its CRC, i.e. a torn tail from a crash mid-write.
+    An entry that has already expired is replayed as an EXPIRED record of its
+    key, without decoding its value.
+    """
+
+    MAGIC = b"LRUBIN01"
+    OPCODES = {"PUT": 1, "GET": 2, "DEL": 3, "ORDER": 4, "PUTX": 5}
+    OPS = {code: op for op, code in OPCODES.items()}
+    _EXPIRES = struct.Struct("<d")
+
+    def __init__(self, serializer=pickle):
+        self.serializer = serializer
+
+    def encode(self, op, key, value=None, expires=None):
+        if expires is not None:
+            op = "PUTX"
+        opcode = self.OPCODES[op]
+        key_bytes = self.serializer.dumps(key)
+        record = bytearray((opcode,))
+        record += _encode_varint(len(key_bytes))
+        if opcode == 1 or opcode == 5:
+            value_bytes = self.serializer.dumps(value)
+            record += _encode_varint(len(value_bytes))
+            if opcode == 5:
+                record += self._EXPIRES.pack(expires)
+            record += key_bytes
+            record += value_bytes
+        else:
+            record += key_bytes
+        record += zlib.crc32(record).to_bytes(4, "little")
+        return bytes(record)
+
+    def replay(self, filename, apply, start=0, now=None):
+        """
+        Calls apply(op, key, value, expires) for every intact record from byte start.
+
+        A PUTX comes back as a PUT with its expiry, or, if it expired by now,
+        as an EXPIRED record of its key.
+
+        Returns:
+            The byte offset just past the last intact record.
+        """
+        size = os.path.getsize(filename)
+        if size <= start:
+            return size
+        loads = self.serializer.loads
+        ops = self.OPS
+        crc32 = zlib.crc32
+        unpack_expires = self._EXPIRES.unpack_from
+        with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            pos = start
+            if pos == 0 and mm[:len(self.MAGIC)] == self.MAGIC:
+                pos = len(self.MAGIC)
+            try:
+                while pos < size:
+                    start = pos
+                    try:
+                        op = ops[mm[pos]]
+                        # Lengths under 128 (nearly all of them) are a single byte
+                        key_len = mm[pos + 1]
+                        pos += 2
+                        if key_len >= 0x80:
+                            key_len, pos = _decode_varint(mm, pos - 1)
+                        value_len = 0
+                        expires = None
+                        if op == "PUT" or op == "PUTX":
+                            value_len = mm[pos]
+                            pos += 1
+                            if value_len >= 0x80:
+                                value_len, pos = _decode_varint(mm, pos - 1)
+                            if op == "PUTX":
+                                expires = unpack_expires(mm, pos)[0]
+                                pos += 8
+                    except (IndexError, KeyError, struct.error):
+                        return start
+                    key_end = pos + key_len
+                    end = key_end + value_len + 4
+                    # CRC32 over a record followed by its own little-endian CRC is a constant
+                    if end > size or crc32(view[start:end]) != _CRC32_RESIDUE:
+                        return start
+                    if expires is None:
+                        apply(op, loads(view[pos:key_end]), loads(view[key_end:end - 4]) if op == "PUT" else None, None)
+                    elif now is not None and expires <= now:
+                        apply("EXPIRED", loads(view[pos:key_end]), None, None)
+                    else:
+                        apply("PUT", loads(view[pos:key_end]), loads(view[key_end:end - 4]), expires)
+                    pos = end
+                return pos
+            finally:
+                view.release()
+
+
 class PersistentLRUCache:
-    def __init__(self, capacity: int, filename: str = LOG_FILE):
-        self.capacity = capacity
+    """
+    LRU cache backed by an append-only operation log.
+
+    Writes use group commit. One append handle stays open, records collect in
+    memory, and the batch is written once batch_size records are pending, once
+    flush_interval seconds have passed since the last flush, or when
+    flush()/close() is called. With flush_interval set, a background flusher
+    thread enforces it, so an idle cache (or one never closed) still writes
+    its pending batch within flush_interval. The defaults (batch of 1,
+    "flush") keep the old behaviour: every operation reaches the OS before
+    returning.
+
+    log_format picks the record encoding: "jsonl" (readable, the default) or
+    "binary" (BinaryCodec with the given serializer; CRC-checked, and a torn
+    tail is truncated away on recovery). A log must be reopened with the
+    format it was written in: binary segments start with BinaryCodec.MAGIC
+    and JSONL ones with "{", and opening either with the other format raises
+    ValueError before anything is read, written or truncated.
+
+    The log is a sequence of segment files listed, in replay order, by a
+    manifest (filename + ".manifest"). Segment 0 is filename itself, so a log
+    that was never compacted is a single file; segment n is filename + ".n".
+
+    snapshot() writes a point-in-time copy of the cache, in LRU order, to
+    snapshot_file from a background thread, tagged with the log position
+    (segment, offset) it covers. Recovery loads the newest snapshot and
+    replays only the log after that position, so restart cost follows the
+    records since the last snapshot rather than the whole log. snapshot_every
+    takes one automatically after that many operations.
+
+    compact() runs online: it copies the cache, switches appends to a fresh
+    segment, and writes the copy as a base segment from a background thread.
+    Once the base is on disk the manifest is atomically replaced by base +
+    the segments written since, and the old segments are deleted. With
+    compact_ratio set, compaction starts by itself once the log is that many
+    times the estimated size of the live entries (and at least
+    COMPACT_MIN_BYTES).
+
+    With log_gets=False reads are not logged; get() is a pure memory
+    operation. Recency is persisted instead by an ORDER record, every key in
+    LRU order, appended every order_every reads (default: capacity), and by
+    snapshots, which close() takes so a clean restart is exact. After a crash
+    the loss is bounded by the reads since the last checkpoint: up to
+    order_every of them are forgotten, so replay evicts by the older order
+    and may keep different (never stale) entries than the crashed process.
+
+    max_bytes bounds the total sizeof(value) of cached entries, on top of (or,
+    with capacity=None, instead of) the entry count. The default sizeof,
+    sys.getsizeof, is exact for str/bytes but shallow for containers. A value
+    larger than max_bytes on its own is logged but not kept.
+
+    put(key, value, ttl) gives an entry a lifetime in seconds (default_ttl
+    when ttl is None; no expiry when both are None). The absolute expiry time
+    from clock() is logged with the entry, so it survives restarts: recovery
+    drops entries that expired while the cache was down, and with the binary
+    format never decodes their values. Until replay ends such an entry holds
+    its slot as a placeholder (counted as 0 bytes against max_bytes), so it
+    evicts what it evicted before the restart and evicted entries cannot
+    come back. Expiry itself is not logged, so an entry the cache expired
+    before later puts still evicts on replay, as if it had lived to its end. An expired entry is removed lazily
+    when get() finds it, and proactively by a hierarchical timing wheel with
+    wheel_tick-second ticks, advanced by expire(), which get() and put() call
+    whenever a tick has passed. Each expiry is O(1), so many expiring keys
+    cost no scan of the cache; removal may lag the expiry by up to one tick,
+    but get() never returns an expired value.
+    """
+
+    COMPACT_MIN_BYTES = 1 << 20
+
+    def __init__(self, capacity: int, filename: str = LOG_FILE, durability: str = "flush",
+                 batch_size: int = 1, flush_interval: float = None, log_format: str = "jsonl",
+                 serializer=pickle, snapshot_file: str = None, snapshot_every: int = None,
+                 log_gets: bool = True, order_every: int = None, max_bytes: int = None,
+                 sizeof=sys.getsizeof, compact_ratio: float = None, default_ttl: float = None,
+                 clock=time.time, wheel_tick: float = 1.0):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {DURABILITY_LEVELS}")
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"log_format must be one of {LOG_FORMATS}")
+        if capacity is None and max_bytes is None:
+            raise ValueError("need capacity, max_bytes or both")
+        self.capacity = sys.maxsize if capacity is None else capacity
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._sizes = {}
         self.filename = filename
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.codec = BinaryCodec(serializer) if log_format == "binary" else JsonlCodec()
+        # persistent_cache.jsonl -> persistent_cache.snap (SNAPSHOT_FILE)
+        self.snapshot_file = snapshot_file or os.path.splitext(filename)[0] + ".snap"
+        self.snapshot_every = snapshot_every
+        self.log_gets = log_gets
+        self.order_every = order_every or capacity or 1024
+        self.compact_ratio = compact_ratio
+        self.manifest_file = filename + ".manifest"
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.wheel_tick = wheel_tick
         self.cache = OrderedDict()
+        # key -> absolute expiry time, for entries that have one
+        self._expiry = {}
+        # Timers are set once replay is done, so overwritten entries never get one
+        self._wheel = None
+        self._pending = []
+        self._last_flush = time.monotonic()
+        # Guards the pending batch, the log file and the segment list against
+        # the flusher and compaction threads
+        self._lock = threading.RLock()
+        self._closing = threading.Event()
+        self._flusher = None
+        self._since_snapshot = 0
+        self._since_order = 0
+        self._snapshot_thread = None
+        self._snapshot_lock = threading.Lock()
+        self._compaction_thread = None
+        # Running size of logged PUT records, to estimate the live data size
+        self._put_bytes = 0
+        self._put_count = 0
+        self._segments = self._read_manifest()
+        self._next_seq = max(self._segments) + 1
+        self._remove_orphans()
+        self._check_log_format(log_format)
         self._load_from_disk()
+        self._wheel = HierarchicalTimingWheel(wheel_tick, start=clock())
+        for key, expires in self._expiry.items():
+            self._wheel.schedule(key, expires)
+        self._active = self._segments[-1]
+        self._file = self._open_segment(self._active)
+        self._log_size = self._file.tell()
+        # Bytes in every segment but the active one
+        self._sealed_bytes = sum(os.path.getsize(self._segment_path(seq)) for seq in self._segments[:-1]
+                                 if os.path.exists(self._segment_path(seq)))
+        if flush_interval is not None:
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    # --- 0. Segments ---
+    def _segment_path(self, seq):
+        return self.filename if seq == 0 else f"{self.filename}.{seq}"
+
+    def _read_manifest(self):
+        """Returns the segment numbers in replay order; [0] without a manifest."""
+        if not os.path.exists(self.manifest_file):
+            return [0]
+        with open(self.manifest_file) as f:
+            return json.load(f)["segments"]
+
+    def _write_manifest(self, segments):
+        """Atomically replaces the manifest with segments."""
+        temp_file = self.manifest_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"segments": segments}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, self.manifest_file)
+
+    def _remove_orphans(self):
+        """Deletes segment files a crash mid-compaction left out of the manifest."""
+        prefix = self.filename + "."
+        for path in glob.glob(glob.escape(prefix) + "*"):
+            suffix = path[len(prefix):]
+            temp = suffix.endswith(".tmp")
+            seq = suffix[:-4] if temp else suffix
+            if seq.isdigit() and (temp or int(seq) not in self._segments):
+                os.remove(path)
+
+    def _open_segment(self, seq):
+        """Opens segment seq for appending, starting it with the codec's header if it is new."""
+        f = open(self._segment_path(seq), "ab")
+        if f.tell() == 0 and self.codec.MAGIC:
+            f.write(self.codec.MAGIC)
+            f.flush()
+        return f
+
+    def _check_log_format(self, log_format):
+        """
+        Checks that every segment was written in log_format.
+
+        Raises:
+            ValueError: if a segment is in the other format, or in none.
+        """
+        magic = BinaryCodec.MAGIC
+        for seq in self._segments:
+            path = self._segment_path(seq)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                head = f.read(len(magic))
+            if not head:
+                continue
+            if head == magic or head[0] in BinaryCodec.OPS:
+                found = "binary"
+            elif head[:1] == b"{":
+                found = "jsonl"
+            elif magic.startswith(head):
+                # A crash tore the header of a segment that never got a record
+                os.truncate(path, 0)
+                continue
+            else:
+                raise ValueError(f"{path} is not a cache log")
+            if found != log_format:
+                raise ValueError(f"{path} is a {found} log, not {log_format}")
+
+    @property
+    def log_bytes(self) -> int:
+        """Bytes written to all log segments (pending records excluded)."""
+        return self._sealed_bytes + self._log_size
 
     # --- 1. Recovery Logic ---
     def _load_from_disk(self):
-        """Reads the append-only log line by line to rebuild the cache state."""
-        if not os.path.exists(self.filename):
-            return
-
+        """Loads the snapshot, if any, then replays the segments after its position."""
+        now = self.clock()
         try:
-            with open(self.filename, "r") as f:
-                for line in f:
-                    try:
-                        record = json.loads(line)
-                        op = record.get("op")
-                        key = record.get("key")
-                        value = record.get("value")
-
-                        if op == "PUT":
-                            if key in self.cache:
-                                self.cache.move_to_end(key)
-                            self.cache[key] = value
-                            if len(self.cache) > self.capacity:
-                                self.cache.popitem(last=False)
-                        
-                        elif op == "GET":
-                            if key in self.cache:
-                                self.cache.move_to_end(key)
-                                
-                        elif op == "DEL":
-                            if key in self.cache:
-                                del self.cache[key]
-
-                    except json.JSONDecodeError:
-                        continue # Skip corrupted lines
+            index, start = self._load_snapshot(now)
+            for seq in self._segments[index:]:
+                path = self._segment_path(seq)
+                if not os.path.exists(path):
+                    continue
+                valid = self.codec.replay(path, self._apply, start, now)
+                if valid < os.path.getsize(path):
+                    if not valid:
+                        # Not one record (nor the header) decoded: this is no torn tail
+                        raise ValueError(f"{path} has no readable records, refusing to truncate it")
+                    # Cut the torn tail so new records are not appended after garbage
+                    os.truncate(path, valid)
+                start = 0
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error recovering cache: {e}")
+        for key in [key for key, value in self.cache.items() if value is _EXPIRED]:
+            del self.cache[key]
+            self._sizes.pop(key, None)
 
-    # --- 2. Write Logic (Append-Only Log) ---
-    def _log(self, op, key, value=None):
-        """Appends an operation to the log file immediately."""
-        entry = {"op": op, "key": key}
-        if value is not None:
-            entry["value"] = value
-        
+    def _load_snapshot(self, now):
+        """
+        Loads the snapshot into the cache, without the entries expired by now.
+
+        Returns:
+            (index into the segment list, offset in that segment) to replay
+            from: the snapshot's position, or (0, 0) if there is no usable
+            snapshot (missing, damaged, from a compacted-away segment, or
+            ahead of a log that lost records). An unusable snapshot is
+            deleted: once new appends grow the log past its offset it would
+            look valid and replay would start mid-record.
+        """
+        if not os.path.exists(self.snapshot_file):
+            return 0, 0
+        with open(self.snapshot_file, "rb") as f:
+            header = f.read(_SNAPSHOT_HEADER)
+        seq, offset = self._snapshot_position(header)
+        if seq not in self._segments:
+            os.remove(self.snapshot_file)
+            return 0, 0
+        path = self._segment_path(seq)
+        if offset > (os.path.getsize(path) if os.path.exists(path) else 0):
+            os.remove(self.snapshot_file)
+            return 0, 0
+        valid = self.codec.replay(self.snapshot_file, self._apply, _SNAPSHOT_HEADER, now)
+        if valid < os.path.getsize(self.snapshot_file):
+            self.cache.clear()
+            self._sizes.clear()
+            self.total_bytes = 0
+            self._expiry.clear()
+            os.remove(self.snapshot_file)
+            return 0, 0
+        return self._segments.index(seq), offset
+
+    @staticmethod
+    def _snapshot_position(header):
+        """Returns (segment, offset) from a snapshot header, or (None, 0) if it is not one."""
+        if header[:len(_SNAPSHOT_MAGIC)] != _SNAPSHOT_MAGIC or len(header) < _SNAPSHOT_HEADER:
+            return None, 0
+        body = header[len(_SNAPSHOT_MAGIC):]
+        return int.from_bytes(body[:8], "little"), int.from_bytes(body[8:16], "little")
+
+    def _apply(self, op, key, value, expires=None):
+        """Applies one replayed log record to the in-memory cache."""
+        cache = self.cache
+        if op == "EXPIRED":
+            # Put as a placeholder, which _load_from_disk drops after replay
+            op, value = "PUT", _EXPIRED
+        if op == "PUT":
+            if expires is not None:
+                self._expiry[key] = expires
+                if self._wheel is not None:
+                    self._wheel.schedule(key, expires)
+            elif self._expiry:
+                self._forget(key)
+            if self.max_bytes is not None:
+                self._put_sized(key, value)
+                return
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > self.capacity:
+                evicted = cache.popitem(last=False)[0]
+                if self._expiry:
+                    self._forget(evicted)
+
+        elif op == "GET":
+            if key in cache:
+                cache.move_to_end(key)
+
+        elif op == "DEL":
+            cache.pop(key, None)
+            self.total_bytes -= self._sizes.pop(key, 0)
+            if self._expiry:
+                self._forget(key)
+
+        elif op == "ORDER":
+            # key is every cached key, oldest first, when the checkpoint was taken
+            move_to_end = cache.move_to_end
+            for k in key:
+                if k in cache:
+                    move_to_end(k)
+
+    def _put_sized(self, key, value):
+        """PUT with byte accounting: evicts oldest entries until both limits hold."""
+        cache, sizes = self.cache, self._sizes
+        size = 0 if value is _EXPIRED else self.sizeof(value)
+        self.total_bytes -= sizes.pop(key, 0)
+        if size > self.max_bytes:
+            cache.pop(key, None)
+            self._forget(key)
+            return
+        cache[key] = value
+        cache.move_to_end(key)
+        sizes[key] = size
+        self.total_bytes += size
+        while len(cache) > self.capacity or self.total_bytes > self.max_bytes:
+            evicted = cache.popitem(last=False)[0]
+            self.total_bytes -= sizes.pop(evicted)
+            self._forget(evicted)
+
+    def _forget(self, key):
+        """Drops key's expiry and its timer, if it has one."""
+        if self._expiry.pop(key, None) is not None and self._wheel is not None:
+            self._wheel.cancel(key)
+
+    # --- 2. Write Logic (Append-Only Log, Group Commit) ---
+    def _log(self, op, key, value=None, expires=None):
+        """Queues an operation for the log and flushes if a threshold is reached."""
+        record = self.codec.encode(op, key, value, expires)
+        if self._flusher is None:
+            self._pending.append(record)
+        else:
+            # Only the flusher thread touches the batch concurrently
+            with self._lock:
+                self._pending.append(record)
+        self._since_snapshot += 1
+        if op == "PUT":
+            self._put_bytes += len(record)
+            self._put_count += 1
+
+        if len(self._pending) >= self.batch_size or (
+            self.flush_interval is not None and time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+        if self.snapshot_every is not None and self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def flush(self):
+        """Writes all pending records as one batch at the configured durability level."""
+        if self._write_pending() and self.compact_ratio is not None:
+            self._maybe_compact()
+
+    def _write_pending(self):
+        """Writes the pending batch; unlike flush(), never starts a compaction. Returns whether there was one."""
+        with self._lock:
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return False
+            batch = b"".join(self._pending)
+            self._pending.clear()
+            try:
+                self._file.write(batch)
+                self._log_size += len(batch)
+                if self.durability != "none":
+                    self._file.flush()
+                if self.durability == "fsync":
+                    os.fsync(self._file.fileno())
+            except IOError as e:
+                print(f"Write failed: {e}")
+            return True
+
+    def _flush_periodically(self):
+        """Flusher thread: writes the pending batch flush_interval after the last flush."""
+        interval = self.flush_interval
+        while not self._closing.wait(max(self._last_flush + interval - time.monotonic(), 0)):
+            if time.monotonic() - self._last_flush >= interval:
+                self._write_pending()
+
+    # --- 3. Snapshots ---
+    def snapshot(self, wait: bool = False):
+        """
+        Starts writing a snapshot of the current cache in a background thread.
+
+        The cache is copied here, so callers can keep using it while the copy
+        is encoded and written. Skipped if a snapshot is still being written.
+
+        Args:
+            wait: Block until the snapshot is on disk.
+        """
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            if wait:
+                self._snapshot_thread.join()
+            return
+        # The snapshot claims everything before offset, so that must be on disk
+        # first, whatever the durability level: a snapshot ahead of the log
+        # after a power loss would point replay into the middle of a record
+        self.flush()
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            seq, offset = self._active, self._log_size
+        self._since_snapshot = 0
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot,
+            args=(list(self.cache.items()), dict(self._expiry), self.clock(), seq, offset),
+            daemon=True,
+        )
+        self._snapshot_thread.start()
+        if wait:
+            self._snapshot_thread.join()
+
+    def _write_snapshot(self, items, expiry, now, seq, offset):
+        """Writes items and their log position to a temp file, then atomically replaces the snapshot."""
+        temp_file = self.snapshot_file + ".tmp"
         try:
-            with open(self.filename, "a") as f:
-                f.write(json.dumps(entry) + "\n")
+            with open(temp_file, "wb") as f:
+                f.write(_SNAPSHOT_MAGIC + seq.to_bytes(8, "little") + offset.to_bytes(8, "little"))
+                self._write_entries(f, items, expiry, now)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._snapshot_lock:
+                os.replace(temp_file, self.snapshot_file)
         except IOError as e:
-            print(f"Write failed: {e}")
+            print(f"Snapshot failed: {e}")
+
+    def _wait_for_snapshot(self):
+        """Joins the snapshot thread, if one was started."""
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+            self._snapshot_thread = None
+
+    def checkpoint_order(self):
+        """Logs the current recency order as one ORDER record (log_gets=False mode)."""
+        self._since_order = 0
+        self._log("ORDER", list(self.cache))
+
+    def close(self):
+        """Flushes pending records, waits for a running snapshot and closes the log."""
+        if self._file.closed:
+            return
+        if not self.log_gets and self._since_snapshot:
+            # Unlogged reads since the last snapshot would otherwise lose recency.
+            # A snapshot still being written copied the cache before them, so
+            # let it finish and take a fresh one.
+            self._wait_for_snapshot()
+            self.snapshot(wait=True)
+        self._close_log()
+
+    def _write_entries(self, f, items, expiry, now):
+        """Writes items as PUT records, with their expiry times, leaving out those expired by now."""
+        encode = self.codec.encode
+        for key, value in items:
+            expires = expiry.get(key)
+            if expires is None:
+                f.write(encode("PUT", key, value))
+            elif expires > now:
+                f.write(encode("PUT", key, value, expires))
+
+    def _close_log(self):
+        """Flushes, waits for running snapshots and compactions and closes the log file."""
+        if self._flusher is not None:
+            self._closing.set()
+            self._flusher.join()
+        self._wait_for_snapshot()
+        # Flushed before the join: the last batch may be what trips compact_ratio
+        self.flush()
+        if self._compaction_thread is not None:
+            self._compaction_thread.join()
+        self._file.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     # --- Public API ---
     def get(self, key):
+        if self._expiry:
+            now = self.clock()
+            if now >= self._wheel.next_deadline:
+                self.expire(now)
+            expires = self._expiry.get(key)
+            if expires is not None and expires <= now:
+                # Expired within the current tick: the wheel has not reached it yet
+                self._apply("DEL", key, None)
+                return -1
         if key not in self.cache:
             return -1
         
         self.cache.move_to_end(key)
-        # Writes to disk to persist the "access" event (so LRU order survives crash)
-        self._log("GET", key)
+        if self.log_gets:
+            # Writes to disk to persist the "access" event (so LRU order survives crash)
+            self._log("GET", key)
+        else:
+            self._since_order += 1
+            self._since_snapshot += 1
+            if self._since_order >= self.order_every:
+                self.checkpoint_order()
+            elif self.snapshot_every is not None and self._since_snapshot >= self.snapshot_every:
+                self.snapshot()
         return self.cache[key]
 
-    def put(self, key, value):
-        if key in self.cache:
-            self.cache.move_to_end(key)
-        
-        self.cache[key] = value
-        self._log("PUT", key, value)
-        
-        if len(self.cache) > self.capacity:
-            self.cache.popitem(last=False)
+    def put(self, key, value, ttl: float = None):
+        if ttl is None:
+            ttl = self.default_ttl
+        expires = None
+        if ttl is not None:
+            now = self.clock()
+            expires = now + ttl
+            if not self._expiry:
+                # The wheel only advances while it holds timers; catch it up in one step
+                self._wheel.advance(now)
+        # Update memory first: _log may snapshot the cache as of this record
+        self._apply("PUT", key, value, expires)
+        self._log("PUT", key, value, expires)
+        if self._expiry and self.clock() >= self._wheel.next_deadline:
+            self.expire()
 
-    def compact(self):
-        """Maintenance: Rewrite the log to only include current active items."""
-        # Create a new temp file, write current state as PUTs
-        temp_file = self.filename + ".tmp"
-        with open(temp_file, "w") as f:
-            for key, value in self.cache.items():
+    def expire(self, now: float = None) -> int:
+        """
+        Removes the entries whose expiry time has passed, by advancing the timing wheel.
+
+        Nothing is logged: the expiry times are in the log already.
+
+        Returns:
+            The number of entries removed.
+        """
+        now = self.clock() if now is None else now
+        expired = self._wheel.advance(now)
+        for key in expired:
+            # The wheel has already dropped the timer
+            del self._expiry[key]
+            self.cache.pop(key, None)
+            self.total_bytes -= self._sizes.pop(key, 0)
+        return len(expired)
+
+    # --- 4. Online Compaction ---
+    def compact(self, wait: bool = False):
+        """
+        Starts rewriting the log as just the current entries, in the background.
+
+        Only the copy of the cache and the switch to a new active segment
+        happen here; reads and writes continue while the base segment is
+        written. Skipped if a compaction is still running.
+
+        Args:
+            wait: Block until the old segments have been replaced.
+        """
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            if wait:
+                self._compaction_thread.join()
+            return
+        # Not flush(): its compact_ratio check would start a nested compaction here
+        self._write_pending()
+        items = list(self.cache.items())
+        expiry = dict(self._expiry)
+        old = list(self._segments)
+        self._rotate()
+        base = self._next_seq
+        self._next_seq += 1
+        self._compaction_thread = threading.Thread(
+            target=self._write_base, args=(items, expiry, self.clock(), old, base), daemon=True
+        )
+        self._compaction_thread.start()
+        if wait:
+            self._compaction_thread.join()
+
+    def _rotate(self):
+        """Seals the active segment and continues appending to a new one."""
+        with self._lock:
+            self._file.flush()
+            if self.durability == "fsync":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._sealed_bytes += self._log_size
+
+            seq = self._next_seq
+            self._next_seq += 1
+            self._segments = self._segments + [seq]
+            # Listed before any record lands in it, so a crash cannot lose its appends
+            self._write_manifest(self._segments)
+            self._active = seq
+            self._file = self._open_segment(seq)
+            self._log_size = self._file.tell()
+
+    def _write_base(self, items, expiry, now, old, base):
+        """
+        Writes items, less those expired by now, as segment base, then swaps it in for the old segments.
+
+        Runs on the compaction thread. A crash before the manifest switch
+        leaves the old segments in force; the orphaned base is removed on the
+        next start.
+        """
+        path = self._segment_path(base)
+        temp_file = path + ".tmp"
+        try:
+            with open(temp_file, "wb") as f:
+                f.write(self.codec.MAGIC)
                 # Write in LRU order (oldest first) so replay builds correct order
-                f.write(json.dumps({"op": "PUT", "key": key, "value": value}) + "\n")
-        
-        # Atomic replace
-        shutil.move(temp_file, self.filename)
-        print("Log compacted.")
+                self._write_entries(f, items, expiry, now)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, path)
+
+            # Serialized with _rotate() on the caller's thread, which also rewrites the manifest
+            with self._lock:
+                segments = [base] + [seq for seq in self._segments if seq not in old]
+                self._write_manifest(segments)
+                self._segments = segments
+                self._sealed_bytes = sum(os.path.getsize(self._segment_path(seq)) for seq in segments[:-1])
+            for seq in old:
+                if os.path.exists(self._segment_path(seq)):
+                    os.remove(self._segment_path(seq))
+            # A snapshot of a removed segment can never be used again
+            with self._snapshot_lock:
+                if os.path.exists(self.snapshot_file):
+                    with open(self.snapshot_file, "rb") as f:
+                        seq, _ = self._snapshot_position(f.read(_SNAPSHOT_HEADER))
+                    if seq is None or seq in old:
+                        os.remove(self.snapshot_file)
+        except IOError as e:
+            print(f"Compaction failed: {e}")
+
+    def _maybe_compact(self):
+        """Starts a compaction once the log outgrows compact_ratio x the live data."""
+        if not self._put_count or (self._compaction_thread is not None and self._compaction_thread.is_alive()):
+            return
+        log_bytes = self._sealed_bytes + self._log_size
+        live_bytes = len(self.cache) * self._put_bytes / self._put_count
+        if log_bytes >= self.COMPACT_MIN_BYTES and log_bytes > self.compact_ratio * live_bytes:
+            self.compact()
+
+
+class ShardedPersistentLRUCache:
+    """
+    Thread-safe PersistentLRUCache split into independent shards.
+
+    A key always maps to the same shard: CRC32 of the key's bytes (or of
+    str(key)), so the mapping survives restarts as long as equal keys have
+    equal str() and the shard count does not change. Each shard is a
+    PersistentLRUCache with its own lock and its own log, named with the shard
+    number before the extension (persistent_cache.3.jsonl), holding
+    capacity // shards entries (the first capacity % shards get one more) and
+    max_bytes // shards bytes, so both must be at least shards. A
+    snapshot_file option is numbered per shard the same way.
+    Eviction is per shard, so the cache as a whole is approximately LRU.
+
+    Threads working on different shards never contend, and one shard's log
+    I/O (write, flush, fsync) releases the GIL while the others keep going.
+    Recovery opens the shards from a thread pool: replay itself holds the GIL,
+    so on a standard build the overlap is in reading the logs from disk.
+
+    Args:
+        capacity: Total entries across all shards, or None.
+        max_bytes: Total byte budget across all shards, or None.
+        filename: Base log name; shard logs and snapshots derive from it.
+        shards: Number of shards.
+        recovery_workers: Threads used to open the shards (default: shards).
+        **options: Passed to every PersistentLRUCache shard.
+    """
+
+    def __init__(self, capacity: int, filename: str = LOG_FILE, shards: int = 16,
+                 recovery_workers: int = None, max_bytes: int = None, **options):
+        # A shard with no room would silently never cache the keys hashed to it
+        if capacity is not None and capacity < shards:
+            raise ValueError(f"capacity ({capacity}) must be at least shards ({shards})")
+        if max_bytes is not None and max_bytes < shards:
+            raise ValueError(f"max_bytes ({max_bytes}) must be at least shards ({shards})")
+        root, ext = os.path.splitext(filename)
+        if capacity is None:
+            capacities = [None] * shards
+        else:
+            capacities = [capacity // shards + (i < capacity % shards) for i in range(shards)]
+        if max_bytes is not None:
+            options["max_bytes"] = max_bytes // shards
+        snapshot_file = options.pop("snapshot_file", None)
+
+        def open_shard(i):
+            shard_options = options
+            if snapshot_file is not None:
+                # One snapshot per shard, like the logs: shared, they would overwrite each other
+                snap_root, snap_ext = os.path.splitext(snapshot_file)
+                shard_options = dict(options, snapshot_file=f"{snap_root}.{i}{snap_ext}")
+            return PersistentLRUCache(capacities[i], f"{root}.{i}{ext}", **shard_options)
+
+        with ThreadPoolExecutor(max_workers=recovery_workers or shards) as pool:
+            self.shards = list(pool.map(open_shard, range(shards)))
+        self._locks = [threading.Lock() for _ in range(shards)]
+
+    def __len__(self):
+        return sum(len(shard.cache) for shard in self.shards)
+
+    def _shard(self, key):
+        data = key if isinstance(key, bytes) else str(key).encode()
+        i = zlib.crc32(data) % len(self.shards)
+        return self._locks[i], self.shards[i]
+
+    def get(self, key):
+        lock, shard = self._shard(key)
+        with lock:
+            return shard.get(key)
+
+    def put(self, key, value, ttl: float = None):
+        lock, shard = self._shard(key)
+        with lock:
+            shard.put(key, value, ttl)
+
+    def expire(self, now: float = None) -> int:
+        removed = 0
+        for lock, shard in zip(self._locks, self.shards):
+            with lock:
+                removed += shard.expire(now)
+        return removed
+
+    def _each(self, method, *args):
+        for lock, shard in zip(self._locks, self.shards):
+            with lock:
+                getattr(shard, method)(*args)
+
+    def flush(self):
+        self._each("flush")
+
+    def snapshot(self, wait: bool = False):
+        self._each("snapshot", wait)
+
+    def compact(self, wait: bool = False):
+        self._each("compact", wait)
+
+    def close(self):
+        self._each("close")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
 # --- Demo & Test ---
 if __name__ == "__main__":
-    if os.path.exists(LOG_FILE):
-        os.remove(LOG_FILE)
+    for path in glob.glob(LOG_FILE + "*"):
+        os.remove(path)
 
     print("=== Phase 1: Operations ===")
     cache = PersistentLRUCache(3)
@@ -116,6 +987,7 @@ if __name__ == "__main__":
 
     print("\n=== Phase 2: Crash Simulation ===")
     # Re-instantiate from file
+    cache.close()
     del cache
     new_cache = PersistentLRUCache(3)
     print(f"Recovered State: {list(new_cache.cache.keys())}")
@@ -126,8 +998,7 @@ if __name__ == "__main__":
     print("Recovery Successful!")
 
     print("\n=== Phase 3: Compaction ===")
-    old_size = os.path.getsize(LOG_FILE)
-    print(f"Log size before compaction: {old_size} bytes")
-    new_cache.compact()
-    new_size = os.path.getsize(LOG_FILE)
-    print(f"Log size after compaction: {new_size} bytes")
+    print(f"Log size before compaction: {new_cache.log_bytes} bytes")
+    new_cache.compact(wait=True)
+    print(f"Log size after compaction: {new_cache.log_bytes} bytes")
+    new_cache.close()
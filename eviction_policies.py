@@ -0,0 +1,388 @@
+import sys
+from collections import OrderedDict
+
+
+class EvictionPolicy:
+    """
+    Decides which key a bounded cache evicts.
+
+    The cache owns the values and the size accounting; a policy only tracks
+    keys. The cache calls insert() when a new key is stored, access() on a hit
+    or an overwrite, miss() on a lookup that missed, remove() when a key
+    leaves other than by eviction, and victim() while it is over budget.
+    victim() picks a resident key and forgets it.
+    """
+
+    def insert(self, key):
+        raise NotImplementedError
+
+    def access(self, key):
+        raise NotImplementedError
+
+    def miss(self, key):
+        pass
+
+    def remove(self, key):
+        raise NotImplementedError
+
+    def victim(self):
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    """Evicts the least recently used key."""
+
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def __len__(self):
+        return len(self._order)
+
+    def insert(self, key):
+        self._order[key] = None
+
+    def access(self, key):
+        self._order.move_to_end(key)
+
+    def remove(self, key):
+        del self._order[key]
+
+    def victim(self):
+        return self._order.popitem(last=False)[0]
+
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Evicts the least frequently used key, the least recent one among ties.
+
+    Keys sit in per-frequency buckets (insertion-ordered), so every operation
+    is O(1) apart from finding the new minimum after remove(), which is done
+    lazily in victim(). Counts never decay: a formerly hot key stays until
+    enough new keys outscore it.
+    """
+
+    def __init__(self):
+        self._freq = {}
+        self._buckets = {}
+        self._min = 0
+
+    def __len__(self):
+        return len(self._freq)
+
+    def insert(self, key):
+        self._freq[key] = 1
+        self._buckets.setdefault(1, OrderedDict())[key] = None
+        self._min = 1
+
+    def access(self, key):
+        f = self._freq[key]
+        bucket = self._buckets[f]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[f]
+            if self._min == f:
+                self._min = f + 1
+        self._freq[key] = f + 1
+        self._buckets.setdefault(f + 1, OrderedDict())[key] = None
+
+    def remove(self, key):
+        f = self._freq.pop(key)
+        bucket = self._buckets[f]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[f]
+
+    def victim(self):
+        if self._min not in self._buckets:
+            self._min = min(self._buckets)
+        bucket = self._buckets[self._min]
+        key = bucket.popitem(last=False)[0]
+        if not bucket:
+            del self._buckets[self._min]
+        del self._freq[key]
+        return key
+
+
+class ARCPolicy(EvictionPolicy):
+    """
+    Adaptive Replacement Cache (Megiddo & Modha).
+
+    T1 holds keys seen once recently, T2 keys seen at least twice. B1 and B2
+    remember keys recently evicted from each. A new key found in B1 means T1
+    was too small, so the target size p of T1 grows; one found in B2 shrinks
+    it. A one-off scan only churns T1 and leaves the frequent keys in T2.
+
+    The cache's budget may be in bytes, so the ghost lists are capped at the
+    current number of resident keys rather than a fixed entry capacity.
+    """
+
+    def __init__(self):
+        self._t1 = OrderedDict()
+        self._t2 = OrderedDict()
+        self._b1 = OrderedDict()
+        self._b2 = OrderedDict()
+        self.p = 0.0
+
+    def __len__(self):
+        return len(self._t1) + len(self._t2)
+
+    def insert(self, key):
+        b1, b2 = self._b1, self._b2
+        if key in b1:
+            self.p = min(self.p + max(len(b2) / len(b1), 1), len(self) + 1)
+            del b1[key]
+            self._t2[key] = None
+        elif key in b2:
+            self.p = max(self.p - max(len(b1) / len(b2), 1), 0)
+            del b2[key]
+            self._t2[key] = None
+        else:
+            self._t1[key] = None
+
+    def access(self, key):
+        if key in self._t1:
+            del self._t1[key]
+            self._t2[key] = None
+        else:
+            self._t2.move_to_end(key)
+
+    def remove(self, key):
+        if key in self._t1:
+            del self._t1[key]
+        else:
+            del self._t2[key]
+
+    def victim(self):
+        t1, t2, b1, b2 = self._t1, self._t2, self._b1, self._b2
+        if t1 and (len(t1) > self.p or not t2):
+            key = t1.popitem(last=False)[0]
+            b1[key] = None
+        else:
+            key = t2.popitem(last=False)[0]
+            b2[key] = None
+
+        resident = len(t1) + len(t2)
+        while len(b1) + len(b2) > resident:
+            if b1 and (len(t1) + len(b1) > resident or not b2):
+                b1.popitem(last=False)
+            else:
+                b2.popitem(last=False)
+        return key
+
+
+class _FrequencySketch:
+    """
+    Count-min sketch of 4-bit counters over 4 rows, halved every 10 * width
+    increments so old popularity fades (the TinyLFU "reset"). The row indexes
+    come from one mixed hash by double hashing, a + i * b (Kirsch-Mitzenmacher).
+    """
+
+    _HALVE = bytes(c >> 1 for c in range(256))
+
+    def __init__(self, expected_entries):
+        width = 16
+        while width < expected_entries:
+            width *= 2
+        self.width = width
+        self._mask = width - 1
+        self._table = bytearray(4 * width)
+        self._additions = 0
+        self._sample = 10 * width
+
+    def _indexes(self, key):
+        h = (hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        a, b = h >> 32, (h & 0xFFFFFFFF) | 1
+        mask, width = self._mask, self.width
+        return (a & mask, width + ((a + b) & mask),
+                2 * width + ((a + 2 * b) & mask), 3 * width + ((a + 3 * b) & mask))
+
+    def increment(self, key):
+        table = self._table
+        for i in self._indexes(key):
+            if table[i] < 15:
+                table[i] += 1
+        self._additions += 1
+        if self._additions >= self._sample:
+            self._table = table.translate(self._HALVE)
+            self._additions //= 2
+
+    def estimate(self, key):
+        table = self._table
+        i0, i1, i2, i3 = self._indexes(key)
+        return min(table[i0], table[i1], table[i2], table[i3])
+
+
+class WTinyLFUPolicy(EvictionPolicy):
+    """
+    W-TinyLFU (Einziger, Friedman & Manes), as in Caffeine.
+
+    New keys enter a small LRU window (window fraction of resident keys). When
+    the window overflows, its LRU key moves to the main segmented LRU as a
+    candidate. On eviction the newest candidate stays only if the frequency
+    sketch rates it above probation's LRU key; otherwise it is the victim. Main keys start
+    in probation and move to protected (protected fraction of main) when hit
+    again. Frequency counts lookups, hits and misses alike.
+
+    Args:
+        expected_entries: Roughly how many keys the cache holds; sizes the sketch.
+        window: Fraction of resident keys in the admission window.
+        protected: Fraction of the main cache in the protected segment.
+    """
+
+    def __init__(self, expected_entries: int = 1024, window: float = 0.01, protected: float = 0.8):
+        self.window_fraction = window
+        self.protected_fraction = protected
+        self.sketch = _FrequencySketch(expected_entries)
+        self._window = OrderedDict()
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+
+    def __len__(self):
+        return len(self._window) + len(self._probation) + len(self._protected)
+
+    def insert(self, key):
+        window = self._window
+        window[key] = None
+        if len(window) > max(1, int(len(self) * self.window_fraction)):
+            # The window's LRU key becomes an admission candidate at probation's MRU end
+            self._probation[window.popitem(last=False)[0]] = None
+
+    def miss(self, key):
+        self.sketch.increment(key)
+
+    def access(self, key):
+        self.sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._probation:
+            del self._probation[key]
+            protected = self._protected
+            protected[key] = None
+            if len(protected) > self.protected_fraction * (len(protected) + len(self._probation)):
+                self._probation[protected.popitem(last=False)[0]] = None
+        else:
+            self._protected.move_to_end(key)
+
+    def remove(self, key):
+        for segment in (self._window, self._probation, self._protected):
+            if key in segment:
+                del segment[key]
+                return
+
+    def victim(self):
+        probation = self._probation
+        if len(probation) > 1:
+            candidate = next(reversed(probation))
+            main_victim = next(iter(probation))
+            if self.sketch.estimate(candidate) > self.sketch.estimate(main_victim):
+                del probation[main_victim]
+                return main_victim
+            del probation[candidate]
+            return candidate
+        for segment in (probation, self._protected, self._window):
+            if segment:
+                return segment.popitem(last=False)[0]
+        raise KeyError("victim() on an empty policy")
+
+
+POLICIES = {"lru": LRUPolicy, "lfu": LFUPolicy, "arc": ARCPolicy, "tinylfu": WTinyLFUPolicy}
+
+
+def make_policy(name: str, expected_entries: int = 1024) -> EvictionPolicy:
+    """Builds a policy by name: "lru", "lfu", "arc" or "tinylfu"."""
+    if name not in POLICIES:
+        raise ValueError(f"policy must be one of {tuple(POLICIES)}")
+    if name == "tinylfu":
+        return WTinyLFUPolicy(expected_entries)
+    return POLICIES[name]()
+
+
+class BoundedCache:
+    """
+    In-memory cache bounded by entry count, estimated bytes, or both.
+
+    sizeof(value) estimates each value's footprint; the default,
+    sys.getsizeof, is exact for str/bytes but shallow for containers, so pass
+    a deep estimate for those. A value larger than max_bytes on its own is not
+    cached. Eviction order comes from policy: a name accepted by make_policy
+    or an EvictionPolicy instance.
+
+    Args:
+        max_entries: Maximum number of entries, or None.
+        max_bytes: Maximum total of sizeof(value), or None.
+        sizeof: Size estimate for a value, in bytes.
+        policy: Eviction policy name or instance.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, sizeof=sys.getsizeof, policy="lru"):
+        if max_entries is None and max_bytes is None:
+            raise ValueError("need max_entries, max_bytes or both")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.policy = make_policy(policy, max_entries or 1024) if isinstance(policy, str) else policy
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+        self._sizes = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key, default=-1):
+        if key in self._data:
+            self.hits += 1
+            self.policy.access(key)
+            return self._data[key]
+        self.misses += 1
+        self.policy.miss(key)
+        return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            self.delete(key)
+            return
+
+        data = self._data
+        if key in data:
+            self.total_bytes += size - self._sizes[key]
+            self.policy.access(key)
+            data[key] = value
+            self._sizes[key] = size
+            self._evict(0, 0)
+        else:
+            # Make room first, so a new key is never its own victim
+            self._evict(1, size)
+            self.policy.insert(key)
+            data[key] = value
+            self._sizes[key] = size
+            self.total_bytes += size
+
+    def _evict(self, entries, size):
+        """Evicts until entries more entries of size more bytes fit the budget."""
+        data = self._data
+        while (self.max_entries is not None and len(data) + entries > self.max_entries) or (
+            self.max_bytes is not None and self.total_bytes + size > self.max_bytes
+        ):
+            victim = self.policy.victim()
+            del data[victim]
+            self.total_bytes -= self._sizes.pop(victim)
+
+    def delete(self, key):
+        """Removes key if present. Returns whether it was."""
+        if key not in self._data:
+            return False
+        del self._data[key]
+        self.total_bytes -= self._sizes.pop(key)
+        self.policy.remove(key)
+        return True
@@ -146,8 +146,57 @@ test_robust(1)
 print("4. test_robust(a=1) [Should HIT previous calculation for (1, 10)]")
 test_robust(a=1)
 
+print("\n=== 6. Memory-Bounded Cache (byte budget instead of maxsize) ===")
+# maxsize counts entries, so 128 results of 10 bytes and 128 of 10 MB look the
+# same. Bound the estimated bytes instead, with a pluggable size function.
+import sys
+from eviction_policies import BoundedCache
+
+def sized_lru(max_bytes, sizeof=sys.getsizeof, policy="lru"):
+    def decorator(func):
+        sig = inspect.signature(func)
+        cache = BoundedCache(max_bytes=max_bytes, sizeof=sizeof, policy=policy)
+        missing = object()
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound_args = sig.bind(*args, **kwargs)
+            bound_args.apply_defaults()
+            key = tuple(bound_args.arguments.items())
+
+            result = cache.get(key, missing)
+            if result is not missing:
+                print("Sized Cache HIT!")
+                return result
+
+            print("Sized Cache MISS - Calculating...")
+            result = func(*args, **kwargs)
+            cache.put(key, result) # Results bigger than max_bytes are simply not kept
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+@sized_lru(max_bytes=3000)
+def make_blob(n):
+    return "x" * n
+
+print("1. make_blob(1000)")
+make_blob(1000)
+print("2. make_blob(n=1000) [Should HIT]")
+make_blob(n=1000)
+print("3. make_blob(1500), then make_blob(1200) [Over budget: evicts the 1000 blob]")
+make_blob(1500)
+make_blob(1200)
+print(f"   {len(make_blob.cache)} entries, {make_blob.cache.total_bytes} bytes of 3000")
+print("4. make_blob(5000) [Bigger than the budget: never cached]")
+make_blob(5000)
+print(f"   {len(make_blob.cache)} entries, {make_blob.cache.total_bytes} bytes of 3000")
+
 print("\n=== Summary of Bugs demonstrated ===")
 print("1. Unhashable kwargs: dicts cannot be dictionary keys.")
 print("2. Kwargs order: {'a':1, 'b':2} != {'b':2, 'a':1} unless sorted.")
 print("3. Argument aliasing: f(1, 2) != f(a=1, b=2) unless bound to signature.")
+print("4. Entry-count bounds: maxsize says nothing about memory when result sizes vary.")
 
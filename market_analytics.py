@@ -1,5 +1,46 @@
-from datetime import datetime, date, time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date, time, timedelta, timezone
+from multiprocessing import shared_memory
 import bisect
+import math
+import os
+
+import numpy as np
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_UTC_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_SECOND = timedelta(seconds=1)
+
+
+def to_epoch_seconds(dt, tz=None):
+    """
+    Converts a datetime to whole epoch seconds.
+
+    Without tz this counts on the wall clock: any tzinfo is ignored, so an
+    aware datetime counts in its own local time. That is the same convention
+    the scalar function uses when it gives market open/close the event's tzinfo.
+
+    With an exchange tz this returns true UTC epoch seconds. Aware datetimes are
+    converted from their own zone and naive ones are read as exchange-local time.
+
+    Raises:
+        ValueError: if dt has microseconds. Every fast path computes
+            clock(end) - clock(start) on whole seconds, and flooring each end
+            separately can differ by one from the scalar function, which
+            truncates the total difference.
+    """
+    if dt.microsecond:
+        raise ValueError(f"{dt} has sub-second precision; market seconds need whole seconds "
+                         "(use dt.replace(microsecond=0) to truncate)")
+    # Plain integer arithmetic: building intermediate datetimes/timedeltas here
+    # costs more than the calendar lookup itself.
+    wall = (dt.toordinal() - _EPOCH_ORDINAL) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+    if tz is None:
+        return wall
+    offset = dt.utcoffset() if dt.tzinfo is not None else tz.utcoffset(dt)
+    return wall - offset // _SECOND
 
 def get_market_seconds_between_events(events, trading_days, market_open, market_close):
     """
@@ -51,3 +92,461 @@ def get_market_seconds_between_events(events, trading_days, market_open, market_
         results.append(int(total_seconds))
         
     return results
+
+# Same shape as functools.lru_cache's cache_info()
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+def _as_epoch(ts, tz=None, floor=False):
+    """
+    Accepts a datetime or epoch seconds and returns whole epoch seconds.
+
+    Sub-second values raise ValueError (see to_epoch_seconds) unless floor is
+    set. Flooring is exact for a single instant compared with session bounds
+    (is the market open, how far is the clock), since sessions open and close
+    on whole seconds; it is only a difference of two floored ends that is off.
+    """
+    if isinstance(ts, datetime):
+        if floor and ts.microsecond:
+            ts = ts.replace(microsecond=0)
+        return to_epoch_seconds(ts, tz)
+    t = int(ts)
+    if t != ts:
+        if not floor:
+            raise ValueError(f"{ts} has sub-second precision; market seconds need whole epoch seconds")
+        t = math.floor(ts)
+    return t
+
+
+def _like(epoch, ts, tz=None):
+    """Converts epoch seconds back into the same kind of value as ts."""
+    if not isinstance(ts, datetime):
+        return epoch
+    if tz is None:
+        return (_EPOCH + timedelta(seconds=epoch)).replace(tzinfo=ts.tzinfo)
+    utc = _UTC_EPOCH + timedelta(seconds=epoch)
+    if ts.tzinfo is None:
+        return utc.astimezone(tz).replace(tzinfo=None)
+    return utc.astimezone(ts.tzinfo)
+
+
+def _session_index(trading_days, market_open, market_close, sessions=None, tz=None):
+    """
+    Builds the prefix-sum index over trading sessions.
+
+    Every trading day contributes one (market_open, market_close) session unless
+    sessions overrides it. sessions maps a date to its list of (open, close)
+    windows; an empty list closes the day, and dates missing from trading_days
+    are added as special sessions.
+
+    With an exchange tz, session boundaries are UTC epochs of the local open and
+    close on each date, so DST transitions are baked into the index.
+
+    Returns:
+        (opens, lengths, cum): int64 arrays of session open epochs, session
+        lengths in seconds, and the market seconds elapsed before each session.
+
+    Raises:
+        ValueError: if two sessions overlap.
+    """
+    sessions = sessions or {}
+    days = sorted(set(trading_days) | set(sessions)) if sessions else trading_days
+
+    open_list = []
+    close_list = []
+    for d in days:
+        for window_open, window_close in sorted(sessions.get(d, [(market_open, market_close)])):
+            open_epoch = to_epoch_seconds(datetime.combine(d, window_open), tz)
+            if close_list and open_epoch < close_list[-1]:
+                raise ValueError(f"overlapping sessions on {d}")
+            open_list.append(open_epoch)
+            close_list.append(max(to_epoch_seconds(datetime.combine(d, window_close), tz), open_epoch))
+
+    opens = np.array(open_list, dtype=np.int64)
+    lengths = np.array(close_list, dtype=np.int64) - opens
+
+    cum = np.zeros(len(opens), dtype=np.int64)
+    if len(opens) > 1:
+        np.cumsum(lengths[:-1], out=cum[1:])
+    return opens, lengths, cum
+
+
+def _market_clock(ts, opens, lengths, cum):
+    """Market seconds elapsed from the first session up to each timestamp in ts."""
+    # Index of the last session that opened at or before ts (-1 if none)
+    idx = np.searchsorted(opens, ts, side="right") - 1
+    safe = np.maximum(idx, 0)
+    into_session = np.clip(ts - opens[safe], 0, lengths[safe])
+    return np.where(idx >= 0, cum[safe] + into_session, 0)
+
+
+def _market_seconds(starts, ends, opens, lengths, cum):
+    """Vectorized clock(end) - clock(start) over a session index."""
+    if len(opens) == 0:
+        return np.zeros(len(starts), dtype=np.int64)
+    elapsed = _market_clock(ends, opens, lengths, cum) - _market_clock(starts, opens, lengths, cum)
+    # end <= start never overlaps a session in the scalar version
+    return np.maximum(elapsed, 0)
+
+
+class TradingCalendar:
+    """
+    A trading calendar compiled once into a prefix-sum index of sessions.
+
+    The calendar keeps a monotonic "market clock": the number of market seconds
+    elapsed from the first session up to a timestamp. Every query is one or two
+    binary searches on that index, so a multi-month event costs the same as an
+    intraday one and nothing is allocated per trading day.
+
+    Half days, holidays and split sessions are passed as sessions, a mapping
+    from date to a list of (open, close) times. They are folded into the same
+    index, so a mixed calendar costs no more per query than a uniform one.
+
+    Timestamps may be datetimes or epoch seconds (see to_epoch_seconds). Pass
+    the exchange tz (e.g. a zoneinfo.ZoneInfo) to compare in UTC epochs: events
+    from any zone are converted once on the way in and the index already
+    accounts for DST. Without tz everything is on the naive wall clock.
+
+    With cache_size > 0, scalar and streaming queries go through a bounded LRU
+    cache keyed on the (start, end) epoch pair, so repeated windows skip the
+    calendar entirely. cache_info() reports hits and misses.
+    """
+
+    def __init__(self, trading_days, market_open, market_close, sessions=None, tz=None, cache_size=0):
+        self.market_open = market_open
+        self.market_close = market_close
+        self.tz = tz
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+        opens, lengths, cum = _session_index(trading_days, market_open, market_close, sessions, tz)
+        # NumPy arrays for the batch path
+        self.opens = opens
+        self.lengths = lengths
+        self.cum = cum
+        # Plain lists for scalar queries: bisect on a list beats a NumPy call per lookup
+        self._opens = opens.tolist()
+        self._lengths = lengths.tolist()
+        self._cum = cum.tolist()
+        # Market clock value at the end of each session
+        self._cum_end = (cum + lengths).tolist()
+
+    def __len__(self):
+        return len(self._opens)
+
+    def epoch(self, ts):
+        """Converts a datetime to epoch seconds using this calendar's convention."""
+        return to_epoch_seconds(ts, self.tz)
+
+    def cache_info(self):
+        """Returns CacheInfo(hits, misses, maxsize, currsize) for the LRU cache."""
+        return CacheInfo(self._hits, self._misses, self.cache_size, len(self._cache))
+
+    def cache_clear(self):
+        self._cache.clear()
+        self._hits = self._misses = 0
+
+    def _cache_get(self, key):
+        value = self._cache.get(key)
+        if value is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._cache.move_to_end(key)
+        return value
+
+    def _cache_put(self, key, value):
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _clock(self, t):
+        """Market seconds elapsed from the first session up to epoch t."""
+        return self._clock_at(t, bisect.bisect_right(self._opens, t) - 1)
+
+    def _clock_at(self, t, idx):
+        """Market clock at epoch t, given idx = the last session opened at or before t."""
+        if idx < 0:
+            return 0
+        return self._cum[idx] + min(max(t - self._opens[idx], 0), self._lengths[idx])
+
+    def _locate(self, t, hint):
+        """
+        Same as bisect_right(opens, t) - 1, but searches outward from a previous
+        answer. For time-sorted input this is O(1) amortized instead of O(log D).
+        """
+        opens = self._opens
+        n = len(opens)
+        pos = hint + 1
+        if pos > 0 and opens[pos - 1] > t:
+            # Went backwards: plain bisect over the prefix
+            return bisect.bisect_right(opens, t, 0, pos) - 1
+        if pos == n or opens[pos] > t:
+            return hint
+        # Gallop forward: 1, 2, 4, ... sessions past the hint, then bisect the last gap
+        lo = pos + 1
+        step = 1
+        hi = pos + step
+        while hi < n and opens[hi] <= t:
+            lo = hi + 1
+            step *= 2
+            hi = pos + step
+        return bisect.bisect_right(opens, t, lo, min(hi, n)) - 1
+
+    def market_seconds(self, start, end):
+        """Market seconds between start and end (0 if end <= start)."""
+        start = _as_epoch(start, self.tz)
+        end = _as_epoch(end, self.tz)
+        if not self.cache_size:
+            return max(self._clock(end) - self._clock(start), 0)
+
+        key = (start, end)
+        seconds = self._cache_get(key)
+        if seconds is None:
+            seconds = max(self._clock(end) - self._clock(start), 0)
+            self._cache_put(key, seconds)
+        return seconds
+
+    def iter_market_seconds(self, events):
+        """
+        Lazily yields market_seconds for each (start, end) pair in events.
+
+        Works on unbounded iterables with O(1) memory. Each endpoint keeps its own
+        cursor into the session index, so roughly time-sorted feeds skip the
+        binary search almost entirely.
+        """
+        start_idx = end_idx = -1
+        for start, end in events:
+            start = _as_epoch(start, self.tz)
+            end = _as_epoch(end, self.tz)
+            if self.cache_size:
+                seconds = self._cache_get((start, end))
+                if seconds is not None:
+                    yield seconds
+                    continue
+            start_idx = self._locate(start, start_idx)
+            end_idx = self._locate(end, end_idx)
+            seconds = max(self._clock_at(end, end_idx) - self._clock_at(start, start_idx), 0)
+            if self.cache_size:
+                self._cache_put((start, end), seconds)
+            yield seconds
+
+    def market_seconds_batch(self, starts, ends):
+        """Vectorized market_seconds over int64 epoch arrays."""
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        return _market_seconds(starts, ends, self.opens, self.lengths, self.cum)
+
+    def add_market_seconds(self, ts, n):
+        """
+        Returns the earliest time at which n market seconds have elapsed after ts.
+
+        Raises:
+            ValueError: if n is negative or the calendar ends before n seconds elapse.
+        """
+        if n < 0:
+            raise ValueError("n must be non-negative")
+        t = _as_epoch(ts, self.tz)
+        if n == 0:
+            return ts
+        target = self._clock(t) + n
+        # First session whose end reaches the target on the market clock
+        idx = bisect.bisect_left(self._cum_end, target)
+        if idx == len(self._cum_end):
+            raise ValueError("calendar ends before the requested market seconds elapse")
+        return _like(self._opens[idx] + (target - self._cum[idx]), ts, self.tz)
+
+    def next_open(self, ts):
+        """
+        Returns ts if the market is open at ts, otherwise the next session open.
+        Returns None if no session opens at or after ts.
+        """
+        t = _as_epoch(ts, self.tz, floor=True)
+        idx = bisect.bisect_right(self._opens, t) - 1
+        if idx >= 0 and t < self._opens[idx] + self._lengths[idx]:
+            return ts
+        # Skip zero-length sessions
+        idx += 1
+        while idx < len(self._opens) and self._lengths[idx] == 0:
+            idx += 1
+        if idx == len(self._opens):
+            return None
+        return _like(self._opens[idx], ts, self.tz)
+
+
+class MarketClock:
+    """
+    Tracks elapsed market seconds for many open events against a live clock.
+
+    Each event stores the calendar's market clock at its start. tick(now)
+    advances one shared market clock, so a refresh costs O(1) no matter how
+    many events are open, and elapsed(event_id) is a subtraction. The clock
+    only moves while a session is open, and ticks that move forward in time
+    reuse the calendar's session cursor instead of bisecting.
+    """
+
+    def __init__(self, calendar):
+        self.calendar = calendar
+        self.now = None
+        self._clock = 0
+        self._idx = -1
+        self._start_clocks = {}
+
+    def __len__(self):
+        return len(self._start_clocks)
+
+    def __contains__(self, event_id):
+        return event_id in self._start_clocks
+
+    def register(self, event_id, start):
+        """Starts tracking event_id, which opened at start."""
+        self._start_clocks[event_id] = self.calendar._clock(_as_epoch(start, self.calendar.tz))
+
+    def tick(self, now):
+        """
+        Advances the shared market clock to now.
+
+        now may have sub-second precision (e.g. datetime.now()): starts are
+        whole seconds, so flooring now truncates each elapsed time exactly as
+        the scalar function does.
+        """
+        t = _as_epoch(now, self.calendar.tz, floor=True)
+        self._idx = self.calendar._locate(t, self._idx)
+        self._clock = self.calendar._clock_at(t, self._idx)
+        self.now = now
+
+    def elapsed(self, event_id):
+        """Market seconds between event_id's start and the last tick."""
+        return max(self._clock - self._start_clocks[event_id], 0)
+
+    def close(self, event_id):
+        """Stops tracking event_id and returns its final elapsed market seconds."""
+        seconds = self.elapsed(event_id)
+        del self._start_clocks[event_id]
+        return seconds
+
+    def snapshot(self):
+        """Returns {event_id: elapsed market seconds} for every open event."""
+        clock = self._clock
+        return {event_id: max(clock - start, 0) for event_id, start in self._start_clocks.items()}
+
+
+def get_market_seconds_between_events_batch(starts, ends, trading_days, market_open, market_close, sessions=None, tz=None):
+    """
+    Vectorized version of get_market_seconds_between_events.
+
+    Instead of looping over every trading day an event touches, this builds a
+    cumulative "market seconds" clock over trading_days once. Each event then
+    costs two binary searches: clock(end) - clock(start).
+
+    Args:
+        starts: int64 array of event start times in epoch seconds (see to_epoch_seconds
+            and TradingCalendar.epoch).
+        ends: int64 array of event end times in epoch seconds, same length as starts.
+        trading_days: A sorted list of datetime.dates.
+        market_open: A datetime.time specifying when the market opens.
+        market_close: A datetime.time specifying when the market closes.
+        sessions: Optional mapping from date to a list of (open, close) times
+            overriding the regular session on that date (see TradingCalendar).
+        tz: Optional exchange timezone. When given, starts/ends are UTC epochs.
+
+    Returns:
+        int64 array [n]: the number of market seconds between each pair of (start, end).
+    """
+    return TradingCalendar(trading_days, market_open, market_close, sessions, tz).market_seconds_batch(starts, ends)
+
+
+def iter_market_seconds_between_events(events, trading_days, market_open, market_close, sessions=None, tz=None):
+    """
+    Generator version of get_market_seconds_between_events.
+
+    Consumes any iterable of (start, end) pairs (datetimes or epoch seconds) and
+    yields the market seconds for each one as it arrives, so the event feed
+    never has to fit in memory.
+    """
+    return TradingCalendar(trading_days, market_open, market_close, sessions, tz).iter_market_seconds(events)
+
+
+# --- Multi-process evaluation ---
+# Worker processes attach to two shared memory blocks instead of receiving
+# pickled arrays: one holds the calendar index (opens, lengths, cum) and one
+# holds the events (starts, ends) plus the output column. A task is just a
+# (lo, hi) slice, and each worker writes its results in place.
+_shared = {}
+
+
+def _attach_shared(name, shape):
+    # Pool workers share the parent's resource tracker, and the parent unlinks
+    # the block once every chunk is done.
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.int64, buffer=block.buf)
+
+
+def _init_worker(index_name, num_sessions, events_name, num_events):
+    index_block, index = _attach_shared(index_name, (3, num_sessions))
+    events_block, events = _attach_shared(events_name, (3, num_events))
+    _shared["blocks"] = (index_block, events_block)
+    _shared["index"] = index
+    _shared["events"] = events
+
+
+def _run_chunk(lo, hi):
+    opens, lengths, cum = _shared["index"]
+    starts, ends, out = _shared["events"]
+    out[lo:hi] = _market_seconds(starts[lo:hi], ends[lo:hi], opens, lengths, cum)
+    return hi - lo
+
+
+def _shared_array(shape):
+    block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    return block, np.ndarray(shape, dtype=np.int64, buffer=block.buf)
+
+
+def market_seconds_parallel(calendar, starts, ends, workers=None, chunk_size=1_000_000):
+    """
+    Evaluates calendar.market_seconds_batch(starts, ends) across a process pool.
+
+    The calendar index and the event columns are placed in shared memory once,
+    so nothing but (lo, hi) chunk bounds is pickled per task. Results come back
+    in the original order.
+
+    Args:
+        calendar: A TradingCalendar.
+        starts: int64 array of event start epochs.
+        ends: int64 array of event end epochs.
+        workers: Number of worker processes (defaults to os.cpu_count()).
+        chunk_size: Number of events per task.
+
+    Returns:
+        int64 array [n] of market seconds.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    n = len(starts)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or n <= chunk_size:
+        return calendar.market_seconds_batch(starts, ends)
+
+    index_block, index = _shared_array((3, len(calendar)))
+    events_block, events = _shared_array((3, n))
+    try:
+        index[0], index[1], index[2] = calendar.opens, calendar.lengths, calendar.cum
+        events[0], events[1] = starts, ends
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(index_block.name, len(calendar), events_block.name, n),
+        ) as pool:
+            futures = [pool.submit(_run_chunk, lo, min(lo + chunk_size, n)) for lo in range(0, n, chunk_size)]
+            for future in futures:
+                future.result()
+
+        return events[2].copy()
+    finally:
+        del index, events
+        for block in (index_block, events_block):
+            block.close()
+            block.unlink()
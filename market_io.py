@@ -0,0 +1,133 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from market_analytics import market_seconds_parallel
+
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+
+# Ticks per second for each Arrow timestamp unit
+_UNIT_TICKS = {"s": 1, "ms": 1_000, "us": 1_000_000, "ns": 1_000_000_000}
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in PARQUET_EXTENSIONS
+
+
+def read_table(path, columns=None):
+    """
+    Reads a Parquet or Arrow IPC file as a pyarrow.Table, memory-mapped.
+
+    Arrow IPC files are mapped zero-copy; Parquet has to be decoded but still
+    reads the file through a memory map.
+    """
+    if _is_parquet(path):
+        return pq.read_table(path, columns=columns, memory_map=True)
+    with pa.memory_map(path, "r") as source:
+        table = ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def write_table(table, path):
+    """Writes table as Parquet or Arrow IPC, chosen by the file extension."""
+    if _is_parquet(path):
+        pq.write_table(table, path)
+        return
+    with pa.OSFile(path, "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _assume_timezone(column, tz):
+    """
+    Localizes a naive timestamp column to tz the way to_epoch_seconds does
+    (fold=0): an ambiguous time takes the earlier of its two offsets, and a
+    time in a DST gap is read with the offset in force before the gap.
+    """
+    earliest = pc.assume_timezone(column, tz, ambiguous="earliest", nonexistent="earliest")
+    # Outside a gap this gives back the input's own offset; inside one, the
+    # offset of the last instant before the gap
+    offset = pc.subtract(pc.local_timestamp(earliest).cast(pa.int64()), earliest.cast(pa.int64()))
+    return pc.subtract(column.cast(pa.int64()), offset).cast(earliest.type)
+
+
+def epoch_column(column, tz=None):
+    """
+    Converts an Arrow timestamp or integer column to an int64 NumPy array of
+    epoch seconds, following the TradingCalendar convention for tz.
+
+    Integer columns are taken to be epoch seconds already. Timestamp columns
+    are reinterpreted as their raw int64 ticks and divided down to seconds, so
+    no per-row Python objects are created. With an exchange tz, naive timestamps
+    are first localized to it (aware ones are already UTC), resolving DST
+    ambiguity and gaps like to_epoch_seconds. Without one, aware
+    timestamps count on their own wall clock, like to_epoch_seconds.
+
+    Raises:
+        ValueError: if the column has nulls (the result has no way to hold
+            them; see annotate_market_seconds) or, like to_epoch_seconds,
+            sub-second timestamps.
+    """
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    if column.null_count:
+        raise ValueError(f"column has {column.null_count} nulls")
+
+    if pa.types.is_timestamp(column.type):
+        if tz is not None and column.type.tz is None:
+            column = _assume_timezone(column, str(tz))
+        elif tz is None and column.type.tz is not None:
+            column = pc.local_timestamp(column)
+        ticks = _UNIT_TICKS[column.type.unit]
+        values = column.cast(pa.int64()).to_numpy(zero_copy_only=False)
+        if ticks == 1:
+            return values
+        seconds, fraction = np.divmod(values, ticks)
+        if fraction.any():
+            raise ValueError("column has sub-second timestamps; market seconds need whole seconds")
+        return seconds
+
+    if pa.types.is_integer(column.type):
+        return column.cast(pa.int64()).to_numpy(zero_copy_only=False)
+
+    raise TypeError(f"expected a timestamp or integer column, got {column.type}")
+
+
+def annotate_market_seconds(src, dst, calendar, start_column="start", end_column="end",
+                            output_column="market_seconds", workers=1, chunk_size=1_000_000):
+    """
+    Reads event columns from src, computes market seconds on the raw int64
+    columns and writes src's table plus an output_column to dst. Rows with a
+    null start or end get a null result.
+
+    Args:
+        src: Input Parquet or Arrow IPC path.
+        dst: Output path; the format follows its extension.
+        calendar: A TradingCalendar.
+        start_column: Name of the event start column.
+        end_column: Name of the event end column.
+        output_column: Name of the int64 column appended with the results.
+        workers: Worker processes for market_seconds_parallel.
+        chunk_size: Events per worker task.
+
+    Returns:
+        The number of rows written.
+    """
+    table = read_table(src)
+    start, end = table.column(start_column), table.column(end_column)
+    nulls = None
+    if start.null_count or end.null_count:
+        nulls = pc.or_(pc.is_null(start), pc.is_null(end)).to_numpy(zero_copy_only=False)
+        # Any placeholder will do: these rows are masked out of the result
+        start = start.fill_null(pa.scalar(0, type=start.type))
+        end = end.fill_null(pa.scalar(0, type=end.type))
+    starts = epoch_column(start, calendar.tz)
+    ends = epoch_column(end, calendar.tz)
+    seconds = market_seconds_parallel(calendar, starts, ends, workers=workers, chunk_size=chunk_size)
+
+    write_table(table.append_column(output_column, pa.array(seconds, type=pa.int64(), mask=nulls)), dst)
+    return table.num_rows
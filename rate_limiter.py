@@ -1,6 +1,18 @@
-from collections import deque
+import asyncio
+import hashlib
+import heapq
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
 
-def solve_rate_limiter(timestamps: list[int], maxRequests: int, windowSize: int) -> list[bool]:
+import numpy as np
+
+# Below this maxRequests the batch solver walks accepts in plain Python
+_BATCH_BLOCK_MIN = 32
+
+def solve_rate_limiter(timestamps: list[int], maxRequests: int, windowSize: int, telemetry=None) -> list[bool]:
     """
     Determines for each request whether it should be allowed based on a sliding window of allowed requests.
     
@@ -8,10 +20,16 @@ def solve_rate_limiter(timestamps: list[int], maxRequests: int, windowSize: int)
         timestamps: A strictly increasing list of request timestamps.
         maxRequests: The maximum number of allowed requests in the window.
         windowSize: The size of the time window [t - windowSize + 1, t].
+        telemetry: Optional RateLimiterTelemetry to record each decision in.
         
     Returns:
         A list of booleans indicating allowing (True) or rejection (False) for each request.
     """
+    if telemetry is not None:
+        # Instrumented path; the plain loop below pays nothing for it
+        limiter = InstrumentedRateLimiter(SlidingLogLimiter(maxRequests, windowSize), telemetry)
+        return limiter.solve(timestamps)
+
     allowed_timestamps = deque()
     results = []
     
@@ -32,3 +50,748 @@ def solve_rate_limiter(timestamps: list[int], maxRequests: int, windowSize: int)
             results.append(False)
             
     return results
+
+
+def solve_rate_limiter_batch(timestamps, maxRequests: int, windowSize: int):
+    """
+    NumPy version of solve_rate_limiter for offline replay of large logs.
+
+    Request j is allowed iff fewer than maxRequests accepted requests fall in
+    [ts[j] - windowSize + 1, ts[j]], i.e. iff the maxRequests-th most recent
+    accept is older than that. With first_after[i] = searchsorted(ts, ts[i] + windowSize)
+    the accepted indices A therefore follow
+
+        A[m] = max(first_after[A[m - k]], A[m - 1] + 1),    k = maxRequests
+
+    so all requests between two accepts are rejected without being visited.
+    The recurrence only looks k accepts back, so a block of k accepts is
+    computed at once with a running maximum; small k uses a plain loop.
+
+    Under light load the last k accepts are often the last k requests. Then
+    request j fits iff ts[j] >= ts[j - k] + windowSize, which is precomputed
+    for every j, so the whole run of accepts is taken in one step.
+
+    Args:
+        timestamps: A strictly increasing sequence (or int64 array) of request timestamps.
+        maxRequests: The maximum number of allowed requests in the window.
+        windowSize: The size of the time window [t - windowSize + 1, t].
+
+    Returns:
+        A boolean NumPy array indicating allowing (True) or rejection (False) for each request.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    n = len(ts)
+    k = maxRequests
+    allowed = np.zeros(n, dtype=bool)
+    if k <= 0 or n == 0:
+        return allowed
+    if n <= k:
+        allowed[:] = True
+        return allowed
+
+    first_after = np.searchsorted(ts, ts + windowSize, side="left")
+    # run_end[j]: first index >= j that would not fit after k consecutive accepts
+    fits = np.zeros(n, dtype=bool)
+    fits[k:] = ts[k:] >= ts[:-k] + windowSize
+    run_end = np.minimum.accumulate(np.where(fits, n, np.arange(n))[::-1])[::-1]
+
+    if k < _BATCH_BLOCK_MIN:
+        # Blocks this small cost more in NumPy call overhead than they save.
+        # Only accepted positions are visited, so index the arrays directly
+        # rather than converting them to lists up front.
+        accepted = list(range(k))
+        last = k - 1
+        while last < n - 1:
+            end = int(run_end[last + 1])
+            if accepted[-k] == last - k + 1 and end > last + 1:
+                accepted.extend(range(last + 1, end))
+                last = end - 1
+                continue
+            last = max(int(first_after[accepted[-k]]), last + 1)
+            accepted.append(last)
+        allowed[[i for i in accepted if i < n]] = True
+        return allowed
+
+    accepted = np.empty(2 * n + k, dtype=np.int64)
+    accepted[:k] = np.arange(k)
+    offsets = np.arange(k)
+    m = k
+    while accepted[m - 1] < n - 1:
+        last = accepted[m - 1]
+        if accepted[m - k] == last - k + 1 and run_end[last + 1] > last + 1:
+            run = np.arange(last + 1, run_end[last + 1])
+            accepted[m:m + len(run)] = run
+            m += len(run)
+            continue
+        # A[m + i] = i + max(A[m - 1] + 1, max_{l <= i} (first_after[A[m - k + l]] - l))
+        block = np.maximum.accumulate(first_after[accepted[m - k:m]] - offsets)
+        accepted[m:m + k] = offsets + np.maximum(block, last + 1)
+        m += k
+
+    accepted = accepted[:m]
+    allowed[accepted[accepted < n]] = True
+    return allowed
+
+def iter_rate_limiter_reordered(timestamps, maxRequests: int, windowSize: int, maxDelay: int):
+    """
+    Streaming solve_rate_limiter for feeds that arrive up to maxDelay ticks out of order.
+
+    Requests wait in a min-heap until no later arrival can precede them, i.e.
+    until their timestamp falls more than maxDelay behind the newest one seen.
+    They are then decided in sorted order (ties keep arrival order), which
+    gives exactly the decisions of the sorted input. The heap holds only the
+    requests inside the maxDelay horizon, so memory depends on the delay
+    bound, not on stream length.
+
+    Args:
+        timestamps: Any iterable of request timestamps, each at most maxDelay
+            ticks older than the newest timestamp before it.
+        maxRequests: The maximum number of allowed requests in the window.
+        windowSize: The size of the time window [t - windowSize + 1, t].
+        maxDelay: How far (in ticks) a request may lag the newest one seen.
+
+    Yields:
+        (index, allowed) pairs in decision order, where index is the request's
+        position in the input.
+
+    Raises:
+        ValueError: if a request arrives more than maxDelay ticks late.
+    """
+    limiter = SlidingLogLimiter(maxRequests, windowSize)
+    pending = []
+    newest = None
+    for index, t in enumerate(timestamps):
+        if newest is None or t > newest:
+            newest = t
+        elif t < newest - maxDelay:
+            raise ValueError(f"request {index} at {t} is more than {maxDelay} ticks behind {newest}")
+        heapq.heappush(pending, (t, index))
+
+        # Anything older than newest - maxDelay can no longer be preceded
+        while pending[0][0] < newest - maxDelay:
+            t_ready, i_ready = heapq.heappop(pending)
+            yield i_ready, limiter.allow(None, t_ready)
+
+    while pending:
+        t_ready, i_ready = heapq.heappop(pending)
+        yield i_ready, limiter.allow(None, t_ready)
+
+
+def solve_rate_limiter_reordered(timestamps: list[int], maxRequests: int, windowSize: int, maxDelay: int) -> list[bool]:
+    """
+    solve_rate_limiter for timestamps that may be up to maxDelay ticks out of order
+    or duplicated. Results are in input order and equal the decisions each request
+    gets when the input is stably sorted first.
+    """
+    results = [False] * len(timestamps)
+    for index, allowed in iter_rate_limiter_reordered(timestamps, maxRequests, windowSize, maxDelay):
+        results[index] = allowed
+    return results
+
+class KeyedRateLimiter:
+    """
+    Base class for per-key rate limiters: allow(key, ts) -> bool.
+
+    Every algorithm takes the same (maxRequests, windowSize) budget and offers
+    solve(timestamps) with the same contract as solve_rate_limiter, so they
+    can be swapped and compared directly.
+
+    Keys are tracked in least-recently-seen order. Once the oldest key's state
+    is indistinguishable from a fresh key (its window has fully expired), it is
+    evicted, so memory is bounded by the keys active within about one window.
+    Timestamps are expected to be non-decreasing across calls.
+    """
+
+    def __init__(self, maxRequests: int, windowSize: int):
+        self.maxRequests = maxRequests
+        self.windowSize = windowSize
+        self._states = OrderedDict()
+
+    def __len__(self):
+        return len(self._states)
+
+    def allow(self, key, t: int) -> bool:
+        states = self._states
+        state = states.get(key)
+        if state is None:
+            state = states[key] = self._new_state()
+        else:
+            states.move_to_end(key)
+
+        allowed = self._acquire(state, t)
+        self._evict_idle(t)
+        return allowed
+
+    def retry_after(self, key, t: int) -> int:
+        """Ticks from t until key's next request could be allowed (0 if now)."""
+        state = self._states.get(key)
+        if state is None:
+            return 0 if self.maxRequests > 0 else self.windowSize
+        return self._retry_after(state, t)
+
+    def solve(self, timestamps: list[int]) -> list[bool]:
+        """Decides a single stream of timestamps, like solve_rate_limiter."""
+        return [self.allow(None, t) for t in timestamps]
+
+    def _evict_idle(self, t):
+        """Evicts idle keys from the least-recently-seen end."""
+        states = self._states
+        while states:
+            oldest = next(iter(states))
+            if not self._is_idle(states[oldest], t):
+                break
+            del states[oldest]
+
+    def _new_state(self):
+        raise NotImplementedError
+
+    def _acquire(self, state, t):
+        """Decides one request against state, updating it if allowed."""
+        raise NotImplementedError
+
+    def _is_idle(self, state, t):
+        """True if state would behave exactly like a new key at time t."""
+        raise NotImplementedError
+
+    def _retry_after(self, state, t):
+        raise NotImplementedError
+
+
+class SlidingLogLimiter(KeyedRateLimiter):
+    """Exact sliding log per key, same decisions as solve_rate_limiter. O(maxRequests) memory per key."""
+
+    def _new_state(self):
+        return deque()
+
+    def _acquire(self, allowed_timestamps, t):
+        lower_bound = t - self.windowSize + 1
+        while allowed_timestamps and allowed_timestamps[0] < lower_bound:
+            allowed_timestamps.popleft()
+
+        if len(allowed_timestamps) < self.maxRequests:
+            allowed_timestamps.append(t)
+            return True
+        return False
+
+    def _is_idle(self, allowed_timestamps, t):
+        return not allowed_timestamps or allowed_timestamps[-1] < t - self.windowSize + 1
+
+    def _retry_after(self, allowed_timestamps, t):
+        lower_bound = t - self.windowSize + 1
+        in_window = [ts for ts in allowed_timestamps if ts >= lower_bound]
+        if len(in_window) < self.maxRequests:
+            return 0
+        # The oldest request that must expire leaves the window at its timestamp + windowSize
+        return in_window[len(in_window) - self.maxRequests] + self.windowSize - t
+
+
+class SlidingWindowCounterLimiter(KeyedRateLimiter):
+    """
+    Sliding window counter: an O(1)-memory approximation of the sliding log.
+
+    Each key keeps two fixed buckets of windowSize ticks: the current bucket's
+    count and the previous one's. The previous count is weighted by how much
+    of the previous bucket still overlaps the window [t - windowSize + 1, t],
+    which assumes its requests were evenly spread.
+    """
+
+    def _new_state(self):
+        # [bucket index, previous bucket count, current bucket count]
+        return [0, 0, 0]
+
+    def _acquire(self, state, t):
+        window = self.windowSize
+        bucket, elapsed = divmod(t, window)
+        if bucket != state[0]:
+            state[1] = state[2] if bucket == state[0] + 1 else 0
+            state[2] = 0
+            state[0] = bucket
+
+        # Share of the previous bucket still inside the window
+        estimate = state[1] * (window - 1 - elapsed) / window + state[2]
+        if estimate < self.maxRequests:
+            state[2] += 1
+            return True
+        return False
+
+    def _is_idle(self, state, t):
+        return state[0] < t // self.windowSize - 1 or (state[1] == 0 and state[2] == 0)
+
+    def _retry_after(self, state, t):
+        window = self.windowSize
+        bucket, elapsed = divmod(t, window)
+        if bucket == state[0]:
+            previous, current = state[1], state[2]
+        else:
+            previous, current = (state[2] if bucket == state[0] + 1 else 0), 0
+
+        if previous * (window - 1 - elapsed) / window + current < self.maxRequests:
+            return 0
+        if current >= self.maxRequests or previous == 0:
+            # Nothing frees up before the next bucket; re-check from there
+            return (bucket + 1) * window - t
+        # First elapsed value at which the previous bucket's weight has decayed enough
+        target = int(window - 1 - (self.maxRequests - current) * window / previous) + 1
+        return max(target - elapsed, 1)
+
+
+class TokenBucketLimiter(KeyedRateLimiter):
+    """
+    Token bucket: bursts of up to maxRequests, refilled at maxRequests per windowSize.
+
+    Tokens are kept in units of 1/windowSize so refills stay exact integers:
+    a request costs windowSize units and each tick adds maxRequests units.
+    """
+
+    def _new_state(self):
+        # [credit, timestamp of last refill]; None = full bucket
+        return [self.maxRequests * self.windowSize, None]
+
+    def _acquire(self, state, t):
+        capacity = self.maxRequests * self.windowSize
+        credit, last = state
+        if last is not None:
+            credit = min(capacity, credit + (t - last) * self.maxRequests)
+        state[1] = t
+
+        if credit >= self.windowSize:
+            state[0] = credit - self.windowSize
+            return True
+        state[0] = credit
+        return False
+
+    def _is_idle(self, state, t):
+        credit, last = state
+        return last is None or credit + (t - last) * self.maxRequests >= self.maxRequests * self.windowSize
+
+    def _retry_after(self, state, t):
+        if self.maxRequests <= 0:
+            return self.windowSize
+        credit, last = state
+        if last is not None:
+            credit = min(self.maxRequests * self.windowSize, credit + (t - last) * self.maxRequests)
+        deficit = self.windowSize - credit
+        return max(-(-deficit // self.maxRequests), 0)
+
+
+class GCRALimiter(KeyedRateLimiter):
+    """
+    Generic cell rate algorithm: one integer per key.
+
+    Requests are spaced by an emission interval of windowSize / maxRequests,
+    with a burst tolerance of maxRequests - 1 intervals. The only state is the
+    theoretical arrival time (TAT) of the next conforming request. Time is
+    scaled by maxRequests so the interval is the integer windowSize.
+    """
+
+    def allow(self, key, t: int) -> bool:
+        states = self._states
+        now = t * self.maxRequests
+        tat = states.pop(key, now)
+        if tat < now:
+            tat = now
+
+        # Allowed while the backlog of TAT ahead of now stays within the burst tolerance
+        allowed = tat - now <= self.windowSize * (self.maxRequests - 1)
+        if allowed:
+            tat += self.windowSize
+        # Re-inserting keeps least-recently-seen order without move_to_end
+        states[key] = tat
+        self._evict_idle(t)
+        return allowed
+
+    def _is_idle(self, tat, t):
+        return tat <= t * self.maxRequests
+
+    def _retry_after(self, tat, t):
+        if self.maxRequests <= 0:
+            return self.windowSize
+        excess = tat - t * self.maxRequests - self.windowSize * (self.maxRequests - 1)
+        return max(-(-excess // self.maxRequests), 0)
+
+
+def monotonic_ms() -> int:
+    """Default clock for live limiters: integer milliseconds."""
+    return time.monotonic_ns() // 1_000_000
+
+
+class ConcurrentRateLimiter:
+    """
+    Thread-safe wrapper that stripes keys across independent limiters.
+
+    Each stripe owns one KeyedRateLimiter (built by factory) and one lock, and
+    a key always maps to the same stripe. Threads working on different
+    stripes never contend, unlike a single global lock. The clock is read
+    while holding the stripe lock, so each stripe sees non-decreasing ticks.
+
+    Example:
+        limiter = ConcurrentRateLimiter(lambda: GCRALimiter(100, 1000))  # 100 per second
+        if limiter.allow(api_key): ...
+    """
+
+    def __init__(self, factory, stripes: int = 64, clock=monotonic_ms):
+        self.clock = clock
+        self._stripes = [(threading.Lock(), factory()) for _ in range(stripes)]
+
+    def __len__(self):
+        return sum(len(limiter) for _, limiter in self._stripes)
+
+    def _stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def allow(self, key, t: int = None) -> bool:
+        lock, limiter = self._stripe(key)
+        with lock:
+            return limiter.allow(key, self.clock() if t is None else t)
+
+    def retry_after(self, key, t: int = None) -> int:
+        lock, limiter = self._stripe(key)
+        with lock:
+            return limiter.retry_after(key, self.clock() if t is None else t)
+
+
+class AsyncRateLimiter:
+    """
+    asyncio front end for a KeyedRateLimiter.
+
+    await acquire(key) waits until the limiter admits a request for key
+    instead of rejecting it, sleeping for the limiter's retry_after hint
+    between attempts. The event loop is single-threaded, so no locks are needed.
+
+    Example (per-host crawl throttle, 5 requests per second):
+        limiter = AsyncRateLimiter(SlidingLogLimiter(5, 1000))
+        await limiter.acquire(urlparse(url).netloc)
+    """
+
+    def __init__(self, limiter, clock=monotonic_ms, ticks_per_second: int = 1000):
+        self.limiter = limiter
+        self.clock = clock
+        self.ticks_per_second = ticks_per_second
+
+    def allow(self, key) -> bool:
+        return self.limiter.allow(key, self.clock())
+
+    async def acquire(self, key):
+        while True:
+            t = self.clock()
+            if self.limiter.allow(key, t):
+                return
+            wait = max(self.limiter.retry_after(key, t), 1)
+            await asyncio.sleep(wait / self.ticks_per_second)
+
+
+class SharedMemoryRateLimiter:
+    """
+    Host-wide sliding window counter shared by every process via shared memory.
+
+    The table lives in a multiprocessing.shared_memory block, so N worker
+    processes draw on one budget instead of each enforcing its own. Each slot
+    holds four int64s: [key hash, bucket index, previous count, current count],
+    the same state as SlidingWindowCounterLimiter.
+
+    Keys hash (stably, not with the per-process hash()) to a group of
+    group_size slots and are found by scanning that group. Each group is
+    guarded by one of lock_stripes multiprocessing locks, so a decision is
+    atomic with respect to every other key in its group. When a group is full,
+    the slot with the oldest bucket is reclaimed; a collision there only makes
+    the limiter briefly more permissive for the evicted key.
+
+    Share the limiter by passing it to child processes (Process args or a Pool
+    initializer). The locks can only travel that way, and the block is
+    re-attached by name on arrival. The creating process should call unlink()
+    when done.
+    """
+
+    FIELDS = 4
+
+    def __init__(self, maxRequests: int, windowSize: int, slots: int = 1 << 16, group_size: int = 8,
+                 lock_stripes: int = 64, clock=monotonic_ms):
+        self.maxRequests = maxRequests
+        self.windowSize = windowSize
+        self.group_size = group_size
+        self.groups = max(slots // group_size, 1)
+        self.clock = clock
+        self._shm = shared_memory.SharedMemory(create=True, size=self.groups * group_size * self.FIELDS * 8)
+        self._locks = [multiprocessing.Lock() for _ in range(lock_stripes)]
+        self._table = self._shm.buf.cast("q")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_shm"] = self._shm.name
+        del state["_table"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._shm = shared_memory.SharedMemory(name=state["_shm"])
+        self._table = self._shm.buf.cast("q")
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def close(self):
+        """Detaches this process from the table."""
+        self._table.release()
+        self._shm.close()
+
+    def unlink(self):
+        """Closes and destroys the table; call once, from the creating process."""
+        self.close()
+        self._shm.unlink()
+
+    @staticmethod
+    def _hash(key) -> int:
+        data = key if isinstance(key, bytes) else str(key).encode()
+        h = int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+        return h or 1  # 0 marks an empty slot
+
+    def allow(self, key, t: int = None) -> bool:
+        h = self._hash(key)
+        group = h % self.groups
+        table = self._table
+        window = self.windowSize
+        width = self.FIELDS
+
+        with self._locks[group % len(self._locks)]:
+            if t is None:
+                t = self.clock()
+            bucket, elapsed = divmod(t, window)
+
+            # Find the key's slot, else an empty one, else the stalest
+            first = group * self.group_size * width
+            slot = empty = None
+            stalest = first
+            for base in range(first, first + self.group_size * width, width):
+                slot_hash = table[base]
+                if slot_hash == h:
+                    slot = base
+                    break
+                if slot_hash == 0:
+                    if empty is None:
+                        empty = base
+                elif table[base + 1] < table[stalest + 1]:
+                    stalest = base
+
+            if slot is None:
+                slot = empty if empty is not None else stalest
+                table[slot] = h
+                table[slot + 1] = bucket
+                table[slot + 2] = table[slot + 3] = 0
+
+            state_bucket = table[slot + 1]
+            if bucket > state_bucket:
+                # Roll the buckets forward. Requests from a slightly behind clock
+                # count as arriving at the start of the current bucket.
+                table[slot + 2] = table[slot + 3] if bucket == state_bucket + 1 else 0
+                table[slot + 3] = 0
+                table[slot + 1] = bucket
+            elif bucket < state_bucket:
+                elapsed = 0
+
+            estimate = table[slot + 2] * (window - 1 - elapsed) / window + table[slot + 3]
+            if estimate < self.maxRequests:
+                table[slot + 3] += 1
+                return True
+            return False
+
+
+class SpaceSaving:
+    """
+    Space-saving sketch (Metwally et al.) of the k most frequent keys in a stream.
+
+    Keeps at most k counters. An untracked key takes over the smallest
+    counter and inherits its count (recorded as the key's possible
+    overestimate), so any key whose true count exceeds n / k is guaranteed
+    to be present. Counters sit in per-count buckets (the stream-summary
+    structure), so the smallest one is found without a scan and add() is
+    O(1) for unit counts.
+
+    With decay_every set, every count (and overestimate) is halved after that
+    many additions, so the ranking follows recent traffic, with a half-life
+    of decay_every additions, rather than all time. A halving costs O(k),
+    once per decay_every additions.
+    """
+
+    def __init__(self, k: int, decay_every: int = None):
+        self.k = k
+        self.decay_every = decay_every
+        self._counts = {}
+        self._errors = {}
+        self._buckets = {}  # count -> OrderedDict of keys, oldest first
+        self._min = 0  # Never above the smallest count; exact whenever its bucket exists
+        self._additions = 0
+
+    def __len__(self):
+        return len(self._counts)
+
+    def add(self, key, count: int = 1):
+        counts, buckets = self._counts, self._buckets
+        old = counts.get(key)
+        if old is not None:
+            self._unlink(key, old)
+            new = old + count
+        elif len(counts) < self.k:
+            new = count
+            self._errors[key] = 0
+        else:
+            if self._min not in buckets:
+                self._min = min(buckets)
+            floor = self._min
+            victim = next(iter(buckets[floor]))
+            self._unlink(victim, floor)
+            del counts[victim]
+            del self._errors[victim]
+            new = floor + count
+            self._errors[key] = floor
+        counts[key] = new
+        buckets.setdefault(new, OrderedDict())[key] = None
+        if new < self._min:
+            self._min = new
+
+        if self.decay_every is not None:
+            self._additions += 1
+            if self._additions >= self.decay_every:
+                self._decay()
+
+    def _unlink(self, key, count):
+        bucket = self._buckets[count]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[count]
+            if self._min == count:
+                # Every other count is higher; exact when the key moves up by one
+                self._min = count + 1
+
+    def _decay(self):
+        """Halves every count and overestimate, dropping counters that reach 0."""
+        self._additions = 0
+        counts, errors = self._counts, self._errors
+        buckets = {}
+        for count in sorted(self._buckets):
+            for key in self._buckets[count]:
+                if count >> 1:
+                    counts[key] = count >> 1
+                    errors[key] >>= 1
+                    buckets.setdefault(count >> 1, OrderedDict())[key] = None
+                else:
+                    del counts[key]
+                    del errors[key]
+        self._buckets = buckets
+        self._min = min(buckets) if buckets else 0
+
+    def top(self, n: int = None):
+        """Returns [(key, count, max_overestimate)] sorted by count, highest first."""
+        ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)
+        return [(key, count, self._errors[key]) for key, count in ranked[:n]]
+
+
+class LatencyHistogram:
+    """Histogram of latencies in power-of-two nanosecond buckets."""
+
+    def __init__(self):
+        self._buckets = [0] * 64
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self, ns: int):
+        self._buckets[ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += ns
+
+    def percentile(self, q: float) -> int:
+        """Upper bound (in ns) of the bucket holding the q-th percentile."""
+        rank = q / 100 * self.count
+        seen = 0
+        for bits, n in enumerate(self._buckets):
+            seen += n
+            if n and seen >= rank:
+                return (1 << bits) - 1
+        return 0
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ns": self.total_ns / self.count if self.count else 0,
+            "p50_ns": self.percentile(50),
+            "p99_ns": self.percentile(99),
+            "p999_ns": self.percentile(99.9),
+            # Upper bound of each non-empty bucket -> number of samples
+            "buckets": {(1 << bits) - 1: n for bits, n in enumerate(self._buckets) if n},
+        }
+
+
+class RateLimiterTelemetry:
+    """
+    Decision counters for a rate limiter: total and per-key accepts/rejects,
+    a rolling top-K sketch of the most throttled keys and a latency histogram.
+
+    Memory is bounded however many keys pass through. Per-key counters are
+    kept for the max_keys most recently seen keys only (the totals stay
+    exact), and the top-K sketch halves its counts every decay_every rejects,
+    so a key that stopped being throttled fades out of it.
+
+    Telemetry is opt-in. Wrap a limiter in InstrumentedRateLimiter or pass
+    telemetry= to solve_rate_limiter; limiters used without it are untouched.
+
+    Args:
+        top_k: Counters in the most-throttled sketch.
+        max_keys: Keys with individual accept/reject counters.
+        decay_every: Rejects between halvings of the sketch (None: never decay).
+    """
+
+    def __init__(self, top_k: int = 20, max_keys: int = 10_000, decay_every: int = 100_000):
+        self.accepted = 0
+        self.rejected = 0
+        self.max_keys = max_keys
+        self.per_key = OrderedDict()  # key -> [accepted, rejected], least recently seen first
+        self.throttled = SpaceSaving(top_k, decay_every)
+        self.latency = LatencyHistogram()
+
+    def record(self, key, allowed: bool, latency_ns: int):
+        per_key = self.per_key
+        counts = per_key.get(key)
+        if counts is None:
+            counts = per_key[key] = [0, 0]
+            if len(per_key) > self.max_keys:
+                per_key.popitem(last=False)
+        else:
+            per_key.move_to_end(key)
+        if allowed:
+            self.accepted += 1
+            counts[0] += 1
+        else:
+            self.rejected += 1
+            counts[1] += 1
+            self.throttled.add(key)
+        self.latency.record(latency_ns)
+
+    def snapshot(self) -> dict:
+        """Everything as plain dicts/lists, ready for JSON or a metrics exporter."""
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "per_key": {key: {"accepted": a, "rejected": r} for key, (a, r) in self.per_key.items()},
+            "top_throttled": [
+                {"key": key, "rejected": count, "max_overestimate": error}
+                for key, count, error in self.throttled.top()
+            ],
+            "latency": self.latency.snapshot(),
+        }
+
+
+class InstrumentedRateLimiter:
+    """Wraps any limiter with allow(key, t), recording every decision in telemetry."""
+
+    def __init__(self, limiter, telemetry: RateLimiterTelemetry):
+        self.limiter = limiter
+        self.telemetry = telemetry
+
+    def allow(self, key, t: int = None) -> bool:
+        start = time.perf_counter_ns()
+        allowed = self.limiter.allow(key, t) if t is not None else self.limiter.allow(key)
+        self.telemetry.record(key, allowed, time.perf_counter_ns() - start)
+        return allowed
+
+    def solve(self, timestamps: list[int]) -> list[bool]:
+        return [self.allow(None, t) for t in timestamps]
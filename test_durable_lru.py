@@ -0,0 +1,621 @@
+import glob
+import json
+import os
+import pickle
+import tempfile
+import time
+import marshal
+import threading
+import unittest
+from unittest import mock
+from durable_lru import (
+    BinaryCodec,
+    PersistentLRUCache,
+    ShardedPersistentLRUCache,
+    _decode_varint,
+    _encode_varint,
+)
+
+class TestPersistentLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "cache.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def log_lines(self):
+        with open(self.filename) as f:
+            return f.read().splitlines()
+
+    def test_recovery(self):
+        with PersistentLRUCache(3, self.filename) as cache:
+            cache.put("A", 1)
+            cache.put("B", 2)
+            cache.put("C", 3)
+            cache.get("A")
+            cache.put("D", 4)
+
+        recovered = PersistentLRUCache(3, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [("C", 3), ("A", 1), ("D", 4)])
+        self.assertEqual(recovered.get("B"), -1)
+        recovered.close()
+
+    def test_group_commit_batches_by_size(self):
+        cache = PersistentLRUCache(10, self.filename, batch_size=3)
+        cache.put("A", 1)
+        cache.put("B", 2)
+        self.assertEqual(self.log_lines(), [])
+        cache.put("C", 3)
+        self.assertEqual(len(self.log_lines()), 3)
+
+        cache.put("D", 4)
+        cache.flush()
+        self.assertEqual(len(self.log_lines()), 4)
+        cache.close()
+
+    def test_group_commit_batches_by_time(self):
+        cache = PersistentLRUCache(10, self.filename, batch_size=100, flush_interval=0.02)
+        cache.put("A", 1)
+        self.assertEqual(self.log_lines(), [])
+        # No later operation: the flusher thread writes the batch by itself
+        time.sleep(0.1)
+        self.assertEqual(len(self.log_lines()), 1)
+        cache.put("B", 2)
+        cache.get("A")
+        time.sleep(0.1)
+        self.assertEqual(len(self.log_lines()), 3)
+        cache.close()
+        self.assertFalse(cache._flusher.is_alive())
+
+    def test_close_flushes_every_durability_level(self):
+        for durability in ("none", "flush", "fsync"):
+            with PersistentLRUCache(10, self.filename, durability=durability, batch_size=50) as cache:
+                cache.put(durability, 1)
+        recovered = PersistentLRUCache(10, self.filename)
+        self.assertEqual(list(recovered.cache), ["none", "flush", "fsync"])
+        recovered.close()
+
+        with self.assertRaises(ValueError):
+            PersistentLRUCache(10, self.filename, durability="sometimes")
+
+    def test_compact_keeps_appending(self):
+        cache = PersistentLRUCache(2, self.filename)
+        for i in range(10):
+            cache.put(f"k{i}", i)
+        cache.compact()
+        # Appends during the compaction go to the new active segment
+        cache.put("after", 1)
+        cache.close()
+        self.assertFalse(os.path.exists(self.filename))
+        self.assertEqual(len(cache._segments), 2)
+
+        recovered = PersistentLRUCache(2, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [("k9", 9), ("after", 1)])
+        recovered.put("again", 2)
+        recovered.compact(wait=True)
+        recovered.close()
+
+        recovered = PersistentLRUCache(2, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [("after", 1), ("again", 2)])
+        encode = recovered.codec.encode
+        self.assertEqual(recovered.log_bytes, len(encode("PUT", "after", 1)) + len(encode("PUT", "again", 2)))
+        recovered.close()
+
+    def test_interrupted_compaction_keeps_old_segments(self):
+        with PersistentLRUCache(10, self.filename) as cache:
+            cache.put("A", 1)
+            cache.compact(wait=True)
+            cache.put("B", 2)
+            segments = list(cache._segments)
+
+        # A base segment written but never switched in, and an unfinished one
+        orphans = [f"{self.filename}.{max(segments) + 1}", f"{self.filename}.{max(segments) + 2}.tmp"]
+        for path in orphans:
+            with open(path, "w") as f:
+                f.write('{"op": "PUT", "key": "ghost", "value": 0}\n')
+
+        recovered = PersistentLRUCache(10, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [("A", 1), ("B", 2)])
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+        recovered.close()
+
+    def test_compact_ratio_triggers(self):
+        cache = PersistentLRUCache(5, self.filename, log_format="binary", compact_ratio=4)
+        cache.COMPACT_MIN_BYTES = 0
+        record = len(cache.codec.encode("PUT", 6, 199))
+        for i in range(200):
+            cache.put(i % 7, i)
+            if cache._compaction_thread is not None:
+                cache._compaction_thread.join()
+            # 5 live records of about the same size: the log stays near 4x that
+            self.assertLessEqual(cache.log_bytes, (4 * 5 + 1) * record)
+        cache.close()
+        self.assertFalse(os.path.exists(self.filename))
+
+        recovered = PersistentLRUCache(5, self.filename, log_format="binary")
+        self.assertEqual(list(recovered.cache.items()), [(i % 7, i) for i in range(195, 200)])
+        recovered.close()
+
+    def test_compact_with_pending_records_runs_once(self):
+        cache = PersistentLRUCache(5, self.filename, batch_size=1000, compact_ratio=2)
+        cache.COMPACT_MIN_BYTES = 0
+        for i in range(50):
+            cache.put(i % 7, i) # All pending: writing them crosses compact_ratio
+        with mock.patch.object(cache, "_write_base", wraps=cache._write_base) as write_base:
+            cache.compact(wait=True)
+        self.assertEqual(write_base.call_count, 1)
+        with open(cache.manifest_file) as f:
+            self.assertEqual(json.load(f)["segments"], cache._segments)
+        cache.close()
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ["cache.jsonl.1", "cache.jsonl.2", "cache.jsonl.manifest"])
+
+        recovered = PersistentLRUCache(5, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [(i % 7, i) for i in range(45, 50)])
+        recovered.close()
+
+    def test_close_waits_for_compaction_it_starts(self):
+        cache = PersistentLRUCache(5, self.filename, batch_size=1000, compact_ratio=2)
+        cache.COMPACT_MIN_BYTES = 0
+        for i in range(50):
+            cache.put(i % 7, i) # All pending: the flush in close() crosses compact_ratio
+        self.assertIsNone(cache._compaction_thread)
+        cache.close()
+        self.assertIsNotNone(cache._compaction_thread)
+        self.assertFalse(cache._compaction_thread.is_alive())
+        self.assertFalse(os.path.exists(self.filename))
+
+        recovered = PersistentLRUCache(5, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [(i % 7, i) for i in range(45, 50)])
+        recovered.close()
+
+    def test_varint_round_trip(self):
+        for n in (0, 1, 127, 128, 300, 2**21, 2**40):
+            encoded = bytes(_encode_varint(n))
+            self.assertEqual(_decode_varint(encoded, 0), (n, len(encoded)))
+
+    def test_binary_log_recovery(self):
+        for serializer in (None, marshal):
+            kwargs = {"log_format": "binary"}
+            if serializer is not None:
+                kwargs["serializer"] = serializer
+            with PersistentLRUCache(3, self.filename, **kwargs) as cache:
+                cache.put("A", {"nested": [1, 2]})
+                cache.put(("tuple", 1), "x" * 500)
+                cache.put("C", None)
+                cache.get("A")
+                cache.put("D", 4)
+
+            recovered = PersistentLRUCache(3, self.filename, **kwargs)
+            self.assertEqual(list(recovered.cache.items()),
+                             [("C", None), ("A", {"nested": [1, 2]}), ("D", 4)])
+            recovered.close()
+            os.remove(self.filename)
+
+    def test_binary_log_truncates_torn_tail(self):
+        with PersistentLRUCache(10, self.filename, log_format="binary") as cache:
+            cache.put("A", 1)
+            cache.put("B", 2)
+        intact = os.path.getsize(self.filename)
+        record = BinaryCodec().encode("PUT", "C", 3)
+
+        # A partial record, then a full-length one with a flipped byte
+        expected = [("A", 1), ("B", 2)]
+        for i, tail in enumerate((record[:-2], record[:-1] + bytes([record[-1] ^ 0xFF]))):
+            with open(self.filename, "ab") as f:
+                f.write(tail)
+            cache = PersistentLRUCache(10, self.filename, log_format="binary")
+            self.assertEqual(list(cache.cache.items()), expected)
+            self.assertEqual(os.path.getsize(self.filename), intact)
+            cache.put(i, "after")
+            cache.close()
+            expected.append((i, "after"))
+            cache = PersistentLRUCache(10, self.filename, log_format="binary")
+            self.assertEqual(list(cache.cache.items()), expected)
+            cache.close()
+            intact = os.path.getsize(self.filename)
+
+    def test_log_format_mismatch_refused(self):
+        for written, other in (("jsonl", "binary"), ("binary", "jsonl")):
+            with PersistentLRUCache(3, self.filename, log_format=written) as cache:
+                cache.put("A", 1)
+                cache.put("B", 2)
+            with open(self.filename, "rb") as f:
+                before = f.read()
+            with self.assertRaises(ValueError):
+                PersistentLRUCache(3, self.filename, log_format=other)
+            with open(self.filename, "rb") as f:
+                self.assertEqual(f.read(), before)
+            recovered = PersistentLRUCache(3, self.filename, log_format=written)
+            self.assertEqual(list(recovered.cache.items()), [("A", 1), ("B", 2)])
+            recovered.close()
+            os.remove(self.filename)
+
+        # Nothing readable from the start is refused too, never truncated to nothing
+        with open(self.filename, "wb") as f:
+            f.write(b"\x01" + b"\xff" * 20)
+        with self.assertRaises(ValueError):
+            PersistentLRUCache(3, self.filename, log_format="binary")
+        self.assertEqual(os.path.getsize(self.filename), 21)
+
+    def test_binary_log_without_header(self):
+        codec = BinaryCodec()
+        with open(self.filename, "wb") as f:
+            f.write(codec.encode("PUT", "A", 1) + codec.encode("PUT", "B", 2))
+        with PersistentLRUCache(3, self.filename, log_format="binary") as cache:
+            self.assertEqual(list(cache.cache.items()), [("A", 1), ("B", 2)])
+            cache.put("C", 3)
+        recovered = PersistentLRUCache(3, self.filename, log_format="binary")
+        self.assertEqual(list(recovered.cache.items()), [("A", 1), ("B", 2), ("C", 3)])
+        recovered.close()
+
+    def test_binary_compact(self):
+        cache = PersistentLRUCache(2, self.filename, log_format="binary")
+        for i in range(10):
+            cache.put(i, str(i))
+        cache.compact(wait=True)
+        cache.close()
+        recovered = PersistentLRUCache(2, self.filename, log_format="binary")
+        self.assertEqual(list(recovered.cache.items()), [(8, "8"), (9, "9")])
+        recovered.close()
+
+        with self.assertRaises(ValueError):
+            PersistentLRUCache(2, self.filename, log_format="xml")
+
+    def test_snapshot_replays_only_tail(self):
+        with PersistentLRUCache(3, self.filename, log_format="binary") as cache:
+            for key, value in (("A", 1), ("B", 2), ("C", 3)):
+                cache.put(key, value)
+            cache.get("A")
+            cache.snapshot(wait=True)
+            covered = os.path.getsize(self.filename)
+            cache.put("D", 4)
+            cache.get("C")
+
+        # Recovery must not read the covered records at all (the header is checked on open)
+        with open(self.filename, "r+b") as f:
+            f.seek(len(BinaryCodec.MAGIC))
+            f.write(b"\xff" * (covered - len(BinaryCodec.MAGIC)))
+        recovered = PersistentLRUCache(3, self.filename, log_format="binary")
+        self.assertEqual(list(recovered.cache.items()), [("A", 1), ("D", 4), ("C", 3)])
+        recovered.close()
+
+    def test_snapshot_every(self):
+        snapshot_file = os.path.join(self.tmpdir.name, "cache.snap")
+        cache = PersistentLRUCache(100, self.filename, snapshot_every=10)
+        for i in range(9):
+            cache.put(i, i)
+        self.assertFalse(os.path.exists(snapshot_file))
+        cache.put(9, 9)
+        cache.close()
+        self.assertTrue(os.path.exists(snapshot_file))
+
+        recovered = PersistentLRUCache(100, self.filename)
+        self.assertEqual(list(recovered.cache), list(range(10)))
+        recovered.close()
+
+    def test_snapshot_ignored_when_unusable(self):
+        snapshot_file = os.path.join(self.tmpdir.name, "cache.snap")
+        with PersistentLRUCache(10, self.filename) as cache:
+            cache.put("A", 1)
+            cache.put("B", 2)
+            cache.snapshot(wait=True)
+
+        # A log that lost records the snapshot claims to cover
+        with open(self.filename, "r+b") as f:
+            f.truncate(os.path.getsize(self.filename) // 2)
+        recovered = PersistentLRUCache(10, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [("A", 1)])
+        recovered.close()
+
+        # compact() rewrites the log, so the old snapshot has to go
+        cache = PersistentLRUCache(10, self.filename)
+        cache.snapshot(wait=True)
+        self.assertTrue(os.path.exists(snapshot_file))
+        cache.compact(wait=True)
+        self.assertFalse(os.path.exists(snapshot_file))
+
+        # A snapshot of the new active segment is used as usual
+        cache.put("C", 3)
+        cache.snapshot(wait=True)
+        cache.put("D", 4)
+        cache.close()
+        with open(snapshot_file, "rb") as f:
+            self.assertEqual(cache._snapshot_position(f.read())[0], cache._segments[-1])
+        recovered = PersistentLRUCache(10, self.filename)
+        self.assertEqual(list(recovered.cache.items()), [("A", 1), ("C", 3), ("D", 4)])
+        recovered.close()
+
+    def test_snapshot_ahead_of_log_survives_two_restarts(self):
+        snapshot_file = os.path.join(self.tmpdir.name, "cache.snap")
+        for log_format in ("jsonl", "binary"):
+            for path in glob.glob(os.path.join(self.tmpdir.name, "cache.*")):
+                os.remove(path)
+            with mock.patch("durable_lru.os.fsync", wraps=os.fsync) as fsync:
+                cache = PersistentLRUCache(100, self.filename, durability="none", log_format=log_format)
+                for i in range(10):
+                    cache.put(f"k{i}", i)
+                cache.snapshot(wait=True)
+                # The log is synced before the snapshot that covers it
+                self.assertEqual(fsync.call_args_list[0], mock.call(cache._file.fileno()))
+                cache.close()
+
+            # Power loss: the log lost records the snapshot covers
+            with open(self.filename, "r+b") as f:
+                f.truncate(os.path.getsize(self.filename) * 6 // 10)
+            first = PersistentLRUCache(100, self.filename, log_format=log_format)
+            survivors = list(first.cache.items())
+            self.assertLess(len(survivors), 10)
+            self.assertFalse(os.path.exists(snapshot_file), log_format)
+            for i in range(10):
+                first.put(f"new{i}", i)
+            first.close()
+
+            # The appends push the log past the stale offset; recovery must still replay it all
+            second = PersistentLRUCache(100, self.filename, log_format=log_format)
+            self.assertEqual(list(second.cache.items()), survivors + [(f"new{i}", i) for i in range(10)], log_format)
+            second.close()
+
+    def test_unlogged_gets_clean_restart(self):
+        for log_format in ("jsonl", "binary"):
+            cache = PersistentLRUCache(3, self.filename, log_format=log_format, log_gets=False)
+            for key, value in (("A", 1), ("B", 2), ("C", 3)):
+                cache.put(key, value)
+            cache.flush()
+            size = os.path.getsize(self.filename)
+            cache.get("A")
+            cache.get("B")
+            self.assertEqual(os.path.getsize(self.filename), size)
+            cache.put("D", 4)
+            cache.close()
+
+            recovered = PersistentLRUCache(3, self.filename, log_format=log_format, log_gets=False)
+            self.assertEqual(list(recovered.cache.items()), [("A", 1), ("B", 2), ("D", 4)])
+            recovered.close()
+            os.remove(self.filename)
+            os.remove(recovered.snapshot_file)
+
+    def test_unlogged_gets_after_running_snapshot(self):
+        cache = PersistentLRUCache(100, self.filename, log_format="binary", log_gets=False)
+        for i in range(100):
+            cache.put(i, i)
+        write_snapshot = cache._write_snapshot
+
+        def slow_write_snapshot(*args):
+            time.sleep(0.05)
+            write_snapshot(*args)
+
+        with mock.patch.object(cache, "_write_snapshot", slow_write_snapshot):
+            cache.snapshot()
+            for i in range(5):
+                cache.get(i) # After the running snapshot copied the cache
+            cache.close()
+
+        recovered = PersistentLRUCache(100, self.filename, log_format="binary", log_gets=False)
+        self.assertEqual(list(recovered.cache)[-5:], [0, 1, 2, 3, 4])
+        recovered.close()
+
+    def test_unlogged_gets_crash_keeps_last_checkpoint(self):
+        cache = PersistentLRUCache(4, self.filename, log_gets=False, order_every=2)
+        for key in "ABCD":
+            cache.put(key, key.lower())
+        cache.get("A")
+        cache.get("B") # ORDER checkpoint: C D A B
+        cache.get("C") # Lost in the crash
+        cache.flush()
+
+        # Reopen without close(), as after a crash
+        recovered = PersistentLRUCache(4, self.filename, log_gets=False, order_every=2)
+        self.assertEqual(list(recovered.cache), ["C", "D", "A", "B"])
+        recovered.close()
+        cache._file.close()
+
+    def test_sharded_recovery(self):
+        with ShardedPersistentLRUCache(10, self.filename, shards=4, log_format="binary") as cache:
+            self.assertEqual([shard.capacity for shard in cache.shards], [3, 3, 2, 2])
+            for i in range(100):
+                cache.put(f"k{i}", i)
+            state = [list(shard.cache.items()) for shard in cache.shards]
+            self.assertEqual(len(cache), 10)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, "cache.3.jsonl")))
+
+        recovered = ShardedPersistentLRUCache(10, self.filename, shards=4, log_format="binary")
+        self.assertEqual([list(shard.cache.items()) for shard in recovered.shards], state)
+        for shard_items in state:
+            for key, value in shard_items:
+                self.assertEqual(recovered.get(key), value)
+        recovered.close()
+
+        # Each shard snapshots to its own file, numbered like the logs
+        snapshot_file = os.path.join(self.tmpdir.name, "c.snap")
+        options = dict(shards=4, log_format="binary", snapshot_file=snapshot_file)
+        with ShardedPersistentLRUCache(40, self.filename, **options) as cache:
+            for i in range(40):
+                cache.put(f"s{i}", i)
+            cache.snapshot(wait=True)
+            cache.put("s0", -1)
+            state = [list(shard.cache.items()) for shard in cache.shards]
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, "c.3.snap")))
+        self.assertFalse(os.path.exists(snapshot_file))
+        recovered = ShardedPersistentLRUCache(40, self.filename, **options)
+        self.assertEqual([list(shard.cache.items()) for shard in recovered.shards], state)
+        recovered.close()
+
+        with self.assertRaises(ValueError):
+            ShardedPersistentLRUCache(3, self.filename, shards=4)
+        with self.assertRaises(ValueError):
+            ShardedPersistentLRUCache(None, self.filename, shards=4, max_bytes=3)
+
+    def test_sharded_concurrent_puts(self):
+        # Tuple keys need the binary format (JSON turns them into lists)
+        cache = ShardedPersistentLRUCache(8000, self.filename, shards=8, batch_size=32, log_format="binary")
+
+        def worker(n):
+            for i in range(500):
+                cache.put((n, i), i)
+                self.assertEqual(cache.get((n, i)), i)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        cache.close()
+
+        recovered = ShardedPersistentLRUCache(8000, self.filename, shards=8, log_format="binary")
+        self.assertEqual(len(recovered), 4000)
+        self.assertEqual(recovered.get((7, 499)), 499)
+        recovered.close()
+
+    def test_byte_budget_survives_recovery(self):
+        with PersistentLRUCache(None, self.filename, max_bytes=100, sizeof=len) as cache:
+            cache.put("a", "x" * 40)
+            cache.put("b", "x" * 40)
+            cache.get("a")
+            cache.put("c", "x" * 30) # Evicts b, the least recent
+            cache.put("big", "x" * 101) # Never kept
+            self.assertEqual(list(cache.cache), ["a", "c"])
+            self.assertEqual(cache.total_bytes, 70)
+
+        recovered = PersistentLRUCache(None, self.filename, max_bytes=100, sizeof=len)
+        self.assertEqual(list(recovered.cache), ["a", "c"])
+        self.assertEqual(recovered.total_bytes, 70)
+        recovered.put("a", "x" * 90) # Growing a pushes c out
+        self.assertEqual(list(recovered.cache), ["a"])
+        recovered.close()
+
+        sharded = ShardedPersistentLRUCache(None, self.filename, shards=4, max_bytes=400)
+        self.assertEqual([shard.max_bytes for shard in sharded.shards], [100] * 4)
+        sharded.close()
+
+        with self.assertRaises(ValueError):
+            PersistentLRUCache(None, self.filename)
+
+    def test_ttl_lazy_and_wheel_expiry(self):
+        now = [1000.0]
+        cache = PersistentLRUCache(None, self.filename, max_bytes=10_000, sizeof=len,
+                                   clock=lambda: now[0], wheel_tick=1.0)
+        cache.put("a", "1", ttl=5)
+        cache.put("b", "2")
+        now[0] = 1004.9
+        self.assertEqual(cache.get("a"), "1")
+        now[0] = 1005.2 # Expired mid-tick: found lazily
+        self.assertEqual(cache.get("a"), -1)
+        self.assertNotIn("a", cache.cache)
+
+        for i in range(500):
+            cache.put(i, "x" * 10, ttl=10 + i % 7)
+        cache.put(0, "y", ttl=100) # Replaces the earlier timer
+        self.assertEqual(cache.total_bytes, 1 + 499 * 10 + 1)
+        now[0] = 1030.0
+        self.assertEqual(cache.expire(), 499)
+        self.assertEqual(list(cache.cache), ["b", 0])
+        self.assertEqual(cache.total_bytes, 2)
+        self.assertEqual(len(cache._wheel), 1)
+
+        # Eviction drops the timer too
+        cache.put("big", "z" * 10_000, ttl=50)
+        self.assertEqual(list(cache.cache), ["big"])
+        self.assertEqual(cache._expiry, {"big": 1080.0})
+        self.assertEqual(len(cache._wheel), 1)
+        cache.close()
+
+    def test_ttl_after_idle_stretch(self):
+        now = [1000.0]
+        cache = PersistentLRUCache(10, self.filename, clock=lambda: now[0], wheel_tick=0.01)
+        cache.put("plain", 1)
+        now[0] += 86_400 # A day without TTL entries
+        start = time.perf_counter()
+        cache.put("a", 1, ttl=5)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertEqual(cache._wheel._now, round(86_400 / 0.01))
+        now[0] += 5
+        self.assertEqual(cache.get("b"), -1) # Any operation past the deadline expires "a"
+        self.assertEqual(list(cache.cache), ["plain"])
+        cache.close()
+
+    def test_ttl_recovery_drops_expired(self):
+        class CountingPickle:
+            loads_calls = 0
+
+            @staticmethod
+            def dumps(obj):
+                return pickle.dumps(obj)
+
+            @classmethod
+            def loads(cls, data):
+                cls.loads_calls += 1
+                return pickle.loads(data)
+
+        for log_format in ("jsonl", "binary"):
+            for path in glob.glob(self.filename + "*"):
+                os.remove(path)
+            now = [1000.0]
+            options = dict(log_format=log_format, serializer=CountingPickle, clock=lambda: now[0])
+            with PersistentLRUCache(10, self.filename, default_ttl=60, **options) as cache:
+                cache.put("short", 1, ttl=5)
+                cache.put("long", 2)
+                cache.put("again", 3, ttl=100)
+                cache.put("again", 4, ttl=5) # The newer, expired value must not bring back 3
+
+            now[0] = 1010.0
+            CountingPickle.loads_calls = 0
+            recovered = PersistentLRUCache(10, self.filename, **options)
+            self.assertEqual(list(recovered.cache.items()), [("long", 2)], log_format)
+            self.assertEqual(recovered._expiry, {"long": 1060.0})
+            if log_format == "binary":
+                # Expired records decode their key only: 1 + 2 + 2 + 1
+                self.assertEqual(CountingPickle.loads_calls, 6)
+
+            # Snapshots and compaction leave expired entries out as well
+            recovered.put("more", 5, ttl=1)
+            now[0] = 1020.0
+            recovered.snapshot(wait=True)
+            recovered.compact(wait=True)
+            recovered.close()
+            now[0] = 1100.0
+            restarted = PersistentLRUCache(10, self.filename, **options)
+            self.assertEqual(len(restarted.cache), 0)
+            restarted.close()
+
+        sharded = ShardedPersistentLRUCache(100, self.filename, shards=4, clock=lambda: now[0])
+        for i in range(40):
+            sharded.put(i, i, ttl=i % 2 + 0.5)
+        now[0] = 1102.0
+        self.assertEqual(sharded.expire(), 40)
+        self.assertEqual(len(sharded), 0)
+        sharded.close()
+
+    def test_ttl_recovery_keeps_evictions(self):
+        for log_format in ("jsonl", "binary"):
+            for path in glob.glob(self.filename + "*"):
+                os.remove(path)
+            now = [1000.0]
+            options = dict(log_format=log_format, clock=lambda: now[0])
+            with PersistentLRUCache(3, self.filename, **options) as cache:
+                cache.put("k4", 0)
+                cache.put("A", 1)
+                cache.put("X", 2, ttl=5)
+                cache.put("B", 3) # Evicts k4, not the still-live X
+                now[0] = 1010.0
+                self.assertEqual(cache.expire(), 1)
+                self.assertEqual(list(cache.cache), ["A", "B"])
+
+            # The expired X still evicts k4 on replay, then goes
+            recovered = PersistentLRUCache(3, self.filename, **options)
+            self.assertEqual(list(recovered.cache.items()), [("A", 1), ("B", 3)], log_format)
+            recovered.put("Y", 4, ttl=5)
+            recovered.snapshot(wait=True)
+            recovered.put("C", 5)
+            recovered.put("D", 6) # Evicts A and B while Y is live
+            recovered.close()
+
+            # The same from a snapshot entry that expired since
+            now[0] = 1020.0
+            restarted = PersistentLRUCache(3, self.filename, **options)
+            self.assertEqual(list(restarted.cache.items()), [("C", 5), ("D", 6)], log_format)
+            self.assertEqual(restarted._expiry, {})
+            restarted.close()
+
+if __name__ == '__main__':
+    unittest.main()
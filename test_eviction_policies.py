@@ -0,0 +1,118 @@
+import random
+import unittest
+from eviction_policies import (
+    ARCPolicy,
+    BoundedCache,
+    LFUPolicy,
+    LRUPolicy,
+    POLICIES,
+    WTinyLFUPolicy,
+    make_policy,
+)
+
+class TestEvictionPolicies(unittest.TestCase):
+    def replay(self, cache, trace):
+        for key in trace:
+            if cache.get(key, None) is None:
+                cache.put(key, key)
+        return cache.hit_ratio
+
+    def test_bounds_hold_for_every_policy(self):
+        rng = random.Random(0)
+        for name in POLICIES:
+            cache = BoundedCache(max_entries=50, max_bytes=5_000, sizeof=lambda v: v[1], policy=name)
+            for _ in range(5_000):
+                key = rng.randrange(300)
+                if rng.random() < 0.1:
+                    cache.delete(key)
+                elif cache.get(key, None) is None:
+                    cache.put(key, (key, rng.randrange(1, 400)))
+                self.assertLessEqual(len(cache), 50)
+                self.assertLessEqual(cache.total_bytes, 5_000)
+                self.assertEqual(len(cache.policy), len(cache))
+            self.assertEqual(cache.total_bytes, sum(v[1] for v in cache._data.values()))
+
+    def test_lru_and_lfu_order(self):
+        lru = BoundedCache(max_entries=2, policy="lru")
+        lfu = BoundedCache(max_entries=2, policy="lfu")
+        for cache in (lru, lfu):
+            cache.put("A", 1)
+            cache.put("B", 2)
+            cache.get("A")
+            cache.get("A")
+            cache.get("B")
+            cache.put("C", 3)
+        # LRU drops the least recent (A); LFU the least used (B)
+        self.assertEqual(sorted(lru._data), ["B", "C"])
+        self.assertEqual(sorted(lfu._data), ["A", "C"])
+
+        policy = LFUPolicy()
+        for key in "XYZ":
+            policy.insert(key)
+        policy.access("X")
+        policy.remove("Y")
+        self.assertEqual(policy.victim(), "Z")
+        self.assertEqual(policy.victim(), "X")
+
+    def test_byte_budget(self):
+        cache = BoundedCache(max_bytes=100, sizeof=len)
+        cache.put("a", "x" * 40)
+        cache.put("b", "x" * 40)
+        cache.put("c", "x" * 40)
+        self.assertEqual(sorted(cache._data), ["b", "c"])
+        self.assertEqual(cache.total_bytes, 80)
+
+        # Too big to cache at all: also drops the old value
+        cache.put("b", "x" * 101)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.total_bytes, 40)
+
+        cache.put("c", "x" * 10)
+        self.assertEqual(cache.total_bytes, 10)
+
+        with self.assertRaises(ValueError):
+            BoundedCache()
+        with self.assertRaises(ValueError):
+            make_policy("fifo")
+
+    def test_scan_resistance(self):
+        # A hot set that fits, interleaved with one-off scans that would flush LRU
+        rng = random.Random(1)
+        trace = []
+        scan_key = 1_000
+        for _ in range(200):
+            trace.extend(rng.randrange(80) for _ in range(50))
+            trace.extend(range(scan_key, scan_key + 100))
+            scan_key += 100
+
+        ratios = {name: self.replay(BoundedCache(max_entries=100, policy=name), trace) for name in POLICIES}
+        self.assertGreater(ratios["arc"], ratios["lru"] + 0.1)
+        self.assertGreater(ratios["tinylfu"], ratios["lru"] + 0.1)
+        self.assertGreater(ratios["lfu"], ratios["lru"] + 0.1)
+
+    def test_arc_adapts(self):
+        arc = ARCPolicy()
+        for key in range(4):
+            arc.insert(key)
+        arc.access(0)
+        self.assertEqual(arc.victim(), 1) # T1 is over its target of 0
+        arc.insert(1) # Ghost hit in B1: grow T1's target
+        self.assertGreater(arc.p, 0)
+        self.assertIn(1, arc._t2)
+
+    def test_tinylfu_rejects_cold_candidate(self):
+        policy = WTinyLFUPolicy(expected_entries=16)
+        cache = BoundedCache(max_entries=10, policy=policy)
+        for key in range(10):
+            cache.put(key, key)
+            for _ in range(3):
+                cache.get(key)
+        for key in range(100, 110):
+            cache.put(key, key)
+        # One-off keys lose admission to frequently read ones; only the newest
+        # (still in the window or awaiting admission) remain
+        self.assertEqual(sorted(key for key in cache._data if key >= 100), [108, 109])
+        self.assertEqual(len(LRUPolicy()), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,16 @@
 import unittest
-from datetime import datetime, date, time, timedelta
-from market_analytics import get_market_seconds_between_events
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+import random
+from market_analytics import (
+    MarketClock,
+    TradingCalendar,
+    get_market_seconds_between_events,
+    get_market_seconds_between_events_batch,
+    iter_market_seconds_between_events,
+    market_seconds_parallel,
+    to_epoch_seconds,
+)
 
 class TestMarketAnalytics(unittest.TestCase):
     def setUp(self):
@@ -18,6 +28,22 @@ class TestMarketAnalytics(unittest.TestCase):
             d += timedelta(days=1)
         self.trading_days.sort()
 
+    @staticmethod
+    def to_epoch_arrays(events):
+        starts = [to_epoch_seconds(start) for start, _ in events]
+        ends = [to_epoch_seconds(end) for _, end in events]
+        return starts, ends
+
+    def random_events(self, n, seed=0):
+        rng = random.Random(seed)
+        base = datetime(2024, 6, 29)
+        events = []
+        for _ in range(n):
+            start = base + timedelta(seconds=rng.randrange(20 * 86400))
+            end = start + timedelta(seconds=rng.randrange(-3600, 10 * 86400))
+            events.append((start, end))
+        return events
+
     def test_example_cases(self):
         events = [
             # 1. Mon Jul 1 09:00 -> Mon Jul 1 09:00
@@ -86,5 +112,237 @@ class TestMarketAnalytics(unittest.TestCase):
         results = get_market_seconds_between_events(events, self.trading_days, self.market_open, self.market_close)
         self.assertEqual(results, [0])
 
+    def test_batch_example_cases(self):
+        # The cases of test_example_cases, through the batch path
+        events = [
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 9, 0, 0)),
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 9, 30, 0)),
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 9, 30, 1)),
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 16, 0, 0)),
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 17, 0, 0)),
+            (datetime(2024, 7, 5, 9, 0, 0), datetime(2024, 7, 5, 17, 0, 0)),
+            (datetime(2024, 7, 5, 9, 0, 0), datetime(2024, 7, 8, 9, 30, 0)),
+            (datetime(2024, 7, 5, 9, 0, 0), datetime(2024, 7, 8, 9, 30, 1)),
+            (datetime(2024, 7, 4, 16, 0, 0), datetime(2024, 7, 5, 9, 30, 0)),
+            (datetime(2024, 7, 4, 16, 0, 0), datetime(2024, 7, 5, 9, 30, 1)),
+        ]
+        expected_results = [0, 0, 1, 23400, 23400, 23400, 23400, 23401, 0, 1]
+
+        starts, ends = self.to_epoch_arrays(events)
+        batch = get_market_seconds_between_events_batch(starts, ends, self.trading_days, self.market_open, self.market_close)
+        self.assertEqual(batch.tolist(), expected_results)
+
+    def test_batch_matches_scalar(self):
+        events = self.random_events(500)
+        expected = get_market_seconds_between_events(events, self.trading_days, self.market_open, self.market_close)
+        starts, ends = self.to_epoch_arrays(events)
+        batch = get_market_seconds_between_events_batch(starts, ends, self.trading_days, self.market_open, self.market_close)
+        self.assertEqual(batch.tolist(), expected)
+
+    def test_batch_no_trading_days(self):
+        events = [(datetime(2024, 7, 1, 10, 0), datetime(2024, 7, 1, 11, 0))]
+        starts, ends = self.to_epoch_arrays(events)
+        batch = get_market_seconds_between_events_batch(starts, ends, [], self.market_open, self.market_close)
+        self.assertEqual(batch.tolist(), [0])
+
+    def test_calendar_matches_scalar(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        events = self.random_events(500, seed=1)
+        expected = get_market_seconds_between_events(events, self.trading_days, self.market_open, self.market_close)
+        self.assertEqual([calendar.market_seconds(start, end) for start, end in events], expected)
+
+    def test_calendar_add_market_seconds(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        # Before the open: the first second lands just after 09:30
+        self.assertEqual(calendar.add_market_seconds(datetime(2024, 7, 1, 9, 0), 1), datetime(2024, 7, 1, 9, 30, 1))
+        # A full session ends exactly at the close
+        self.assertEqual(calendar.add_market_seconds(datetime(2024, 7, 1, 9, 30), 23400), datetime(2024, 7, 1, 16, 0))
+        # Friday close rolls over the weekend
+        self.assertEqual(calendar.add_market_seconds(datetime(2024, 7, 5, 15, 59), 120), datetime(2024, 7, 8, 9, 31))
+        self.assertEqual(calendar.add_market_seconds(datetime(2024, 7, 6), 0), datetime(2024, 7, 6))
+
+        events = self.random_events(200, seed=2)
+        for start, _ in events:
+            try:
+                end = calendar.add_market_seconds(start, 5000)
+            except ValueError:
+                continue
+            self.assertEqual(calendar.market_seconds(start, end), 5000)
+
+        with self.assertRaises(ValueError):
+            calendar.add_market_seconds(datetime(2024, 7, 15, 15, 0), 7200)
+
+    def test_calendar_next_open(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 1, 9, 0)), datetime(2024, 7, 1, 9, 30))
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 1, 10, 0)), datetime(2024, 7, 1, 10, 0))
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 5, 16, 0)), datetime(2024, 7, 8, 9, 30))
+        self.assertIsNone(calendar.next_open(datetime(2024, 7, 15, 16, 0)))
+
+    def test_streaming_matches_scalar(self):
+        events = self.random_events(500, seed=3)
+        expected = get_market_seconds_between_events(events, self.trading_days, self.market_open, self.market_close)
+
+        # Unordered feed, consumed from a one-shot generator
+        stream = iter_market_seconds_between_events(
+            (event for event in events), self.trading_days, self.market_open, self.market_close)
+        self.assertEqual(list(stream), expected)
+
+        # Time-sorted feed exercises the forward cursor
+        events.sort()
+        expected = get_market_seconds_between_events(events, self.trading_days, self.market_open, self.market_close)
+        stream = iter_market_seconds_between_events(iter(events), self.trading_days, self.market_open, self.market_close)
+        self.assertEqual(list(stream), expected)
+
+    def test_parallel_matches_batch(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        starts, ends = self.to_epoch_arrays(self.random_events(1000, seed=4))
+        expected = calendar.market_seconds_batch(starts, ends)
+        result = market_seconds_parallel(calendar, starts, ends, workers=2, chunk_size=128)
+        self.assertEqual(result.tolist(), expected.tolist())
+
+    def test_calendar_cache(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close, cache_size=2)
+        auction = (datetime(2024, 7, 1, 9, 30), datetime(2024, 7, 1, 10, 0))
+        other = (datetime(2024, 7, 2, 9, 0), datetime(2024, 7, 2, 17, 0))
+        third = (datetime(2024, 7, 3, 9, 0), datetime(2024, 7, 3, 10, 0))
+
+        self.assertEqual([calendar.market_seconds(*auction) for _ in range(3)], [1800] * 3)
+        self.assertEqual(calendar.cache_info(), (2, 1, 2, 1))
+
+        self.assertEqual(list(calendar.iter_market_seconds([other, auction, third, auction, other])),
+                         [23400, 1800, 1800, 1800, 23400])
+        # 'other' was evicted once 'third' pushed the cache past two entries
+        self.assertEqual(calendar.cache_info(), (4, 4, 2, 2))
+
+        events = self.random_events(300, seed=5)
+        expected = get_market_seconds_between_events(events, self.trading_days, self.market_open, self.market_close)
+        self.assertEqual(list(calendar.iter_market_seconds(events + events)), expected + expected)
+
+        calendar.cache_clear()
+        self.assertEqual(calendar.cache_info(), (0, 0, 2, 0))
+
+    def test_market_clock(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        clock = MarketClock(calendar)
+        clock.register("pre_open", datetime(2024, 7, 5, 9, 0))
+        clock.register("midday", datetime(2024, 7, 5, 12, 0))
+
+        clock.tick(datetime(2024, 7, 5, 9, 30, 1))
+        self.assertEqual(clock.snapshot(), {"pre_open": 1, "midday": 0})
+
+        clock.tick(datetime(2024, 7, 5, 15, 0))
+        self.assertEqual(clock.elapsed("midday"), 3 * 3600)
+
+        # Nothing advances over the weekend
+        clock.tick(datetime(2024, 7, 6, 12, 0))
+        weekend = clock.snapshot()
+        clock.tick(datetime(2024, 7, 8, 9, 30))
+        self.assertEqual(clock.snapshot(), weekend)
+        self.assertEqual(weekend, {"pre_open": 23400, "midday": 4 * 3600})
+
+        clock.register("monday", datetime(2024, 7, 8, 9, 30))
+        clock.tick(datetime(2024, 7, 8, 10, 0))
+        self.assertEqual(clock.close("pre_open"), 23400 + 1800)
+        self.assertNotIn("pre_open", clock)
+        self.assertEqual(len(clock), 2)
+
+        # Ticks agree with the one-shot computation
+        for start, end in self.random_events(100, seed=6):
+            clock.register("check", start)
+            clock.tick(end)
+            self.assertEqual(clock.close("check"), calendar.market_seconds(start, end))
+
+    def test_calendar_session_overrides(self):
+        sessions = {
+            date(2024, 7, 3): [(time(9, 30), time(13, 0))],                       # Half day
+            date(2024, 7, 4): [],                                                  # Holiday
+            date(2024, 7, 6): [(time(10, 0), time(12, 0))],                       # Special Saturday session
+            date(2024, 7, 9): [(time(13, 0), time(16, 0)), (time(9, 30), time(12, 0))],  # Split session
+        }
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close, sessions)
+
+        cases = [
+            ((datetime(2024, 7, 3, 9, 0), datetime(2024, 7, 3, 17, 0)), 12600),
+            ((datetime(2024, 7, 4, 9, 0), datetime(2024, 7, 4, 17, 0)), 0),
+            ((datetime(2024, 7, 3, 12, 0), datetime(2024, 7, 5, 9, 31)), 3660),
+            ((datetime(2024, 7, 6, 0, 0), datetime(2024, 7, 7, 0, 0)), 7200),
+            ((datetime(2024, 7, 9, 11, 0), datetime(2024, 7, 9, 14, 0)), 7200),
+            ((datetime(2024, 7, 1, 9, 30), datetime(2024, 7, 10, 9, 30)), 4 * 23400 + 12600 + 7200 + 19800),
+        ]
+        events = [event for event, _ in cases]
+        expected = [seconds for _, seconds in cases]
+        self.assertEqual([calendar.market_seconds(start, end) for start, end in events], expected)
+
+        starts, ends = self.to_epoch_arrays(events)
+        batch = get_market_seconds_between_events_batch(starts, ends, self.trading_days, self.market_open, self.market_close, sessions)
+        self.assertEqual(batch.tolist(), expected)
+
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 3, 14, 0)), datetime(2024, 7, 5, 9, 30))
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 9, 12, 30)), datetime(2024, 7, 9, 13, 0))
+        self.assertEqual(calendar.add_market_seconds(datetime(2024, 7, 5, 15, 59), 120), datetime(2024, 7, 6, 10, 1))
+
+    def test_calendar_exchange_timezone(self):
+        new_york = ZoneInfo("America/New_York")
+        # US DST starts Sun Mar 10 2024: the open moves from 14:30 UTC to 13:30 UTC
+        calendar = TradingCalendar([date(2024, 3, 8), date(2024, 3, 11)], self.market_open, self.market_close, tz=new_york)
+        utc = timezone.utc
+
+        cases = [
+            ((datetime(2024, 3, 8, 14, 30, tzinfo=utc), datetime(2024, 3, 8, 21, 0, tzinfo=utc)), 23400),
+            ((datetime(2024, 3, 11, 13, 30, tzinfo=utc), datetime(2024, 3, 11, 20, 0, tzinfo=utc)), 23400),
+            ((datetime(2024, 3, 8, 20, 0, tzinfo=utc), datetime(2024, 3, 11, 14, 30, tzinfo=utc)), 7200),
+            # Naive datetimes are exchange-local
+            ((datetime(2024, 3, 8, 15, 0), datetime(2024, 3, 11, 10, 0)), 5400),
+            # Mixed zones on one event
+            ((datetime(2024, 3, 8, 15, 0, tzinfo=new_york), datetime(2024, 3, 11, 15, 0, tzinfo=ZoneInfo("Europe/London"))), 3600 + 5400),
+        ]
+        events = [event for event, _ in cases]
+        expected = [seconds for _, seconds in cases]
+        self.assertEqual([calendar.market_seconds(start, end) for start, end in events], expected)
+        self.assertEqual(list(calendar.iter_market_seconds(events)), expected)
+
+        starts = [calendar.epoch(start) for start, _ in events]
+        ends = [calendar.epoch(end) for _, end in events]
+        self.assertEqual(calendar.market_seconds_batch(starts, ends).tolist(), expected)
+
+        self.assertEqual(calendar.next_open(datetime(2024, 3, 9, tzinfo=utc)), datetime(2024, 3, 11, 13, 30, tzinfo=utc))
+        self.assertEqual(calendar.next_open(datetime(2024, 3, 9)), datetime(2024, 3, 11, 9, 30))
+        self.assertEqual(calendar.add_market_seconds(datetime(2024, 3, 8, 15, 59), 120), datetime(2024, 3, 11, 9, 31))
+
+    def test_subsecond_parity(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        start = datetime(2024, 7, 1, 10, 0, 0, 900_000)
+        end = datetime(2024, 7, 1, 10, 0, 2, 100_000)
+        # The scalar function truncates the total: 1.2s -> 1, where floored ends would give 2
+        self.assertEqual(get_market_seconds_between_events([(start, end)], self.trading_days,
+                                                           self.market_open, self.market_close), [1])
+        with self.assertRaises(ValueError):
+            to_epoch_seconds(start)
+        with self.assertRaises(ValueError):
+            calendar.market_seconds(start, end)
+        with self.assertRaises(ValueError):
+            list(calendar.iter_market_seconds([(start, end)]))
+        with self.assertRaises(ValueError):
+            calendar.market_seconds(to_epoch_seconds(start.replace(microsecond=0)) + 0.9, 2e9)
+
+        # A single instant floors exactly: whole-second starts, sub-second ticks
+        clock = MarketClock(calendar)
+        whole = start.replace(microsecond=0)
+        clock.register("e", whole)
+        for now in (end, datetime(2024, 7, 1, 15, 59, 59, 999_999), datetime(2024, 7, 2, 9, 30, 0, 500_000)):
+            clock.tick(now)
+            expected = get_market_seconds_between_events([(whole, now)], self.trading_days,
+                                                         self.market_open, self.market_close)
+            self.assertEqual(clock.elapsed("e"), expected[0])
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 1, 15, 59, 59, 500_000)),
+                         datetime(2024, 7, 1, 15, 59, 59, 500_000))
+        self.assertEqual(calendar.next_open(datetime(2024, 7, 1, 16, 0, 0, 500_000)), datetime(2024, 7, 2, 9, 30))
+
+    def test_calendar_rejects_overlapping_sessions(self):
+        sessions = {date(2024, 7, 9): [(time(9, 30), time(12, 0)), (time(11, 0), time(16, 0))]}
+        with self.assertRaises(ValueError):
+            TradingCalendar(self.trading_days, self.market_open, self.market_close, sessions)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pyarrow as pa
+
+from market_analytics import TradingCalendar, get_market_seconds_between_events, to_epoch_seconds
+from market_io import annotate_market_seconds, epoch_column, read_table, write_table
+
+class TestMarketIO(unittest.TestCase):
+    def setUp(self):
+        self.market_open = time(9, 30)
+        self.market_close = time(16, 0)
+        d = date(2024, 7, 1)
+        self.trading_days = []
+        while d <= date(2024, 7, 15):
+            if d.weekday() < 5:
+                self.trading_days.append(d)
+            d += timedelta(days=1)
+
+        self.events = [
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 9, 30, 1)),
+            (datetime(2024, 7, 1, 9, 0, 0), datetime(2024, 7, 1, 17, 0, 0)),
+            (datetime(2024, 7, 5, 9, 0, 0), datetime(2024, 7, 8, 9, 30, 1)),
+            (datetime(2024, 7, 4, 16, 0, 0), datetime(2024, 7, 5, 9, 30, 1)),
+        ]
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def event_table(self, unit):
+        return pa.table({
+            "order_id": pa.array(range(len(self.events))),
+            "start": pa.array([start for start, _ in self.events], type=pa.timestamp(unit)),
+            "end": pa.array([end for _, end in self.events], type=pa.timestamp(unit)),
+        })
+
+    def test_round_trip_formats(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        expected = get_market_seconds_between_events(self.events, self.trading_days, self.market_open, self.market_close)
+
+        for name, unit in (("events.parquet", "us"), ("events.arrow", "ns")):
+            src = os.path.join(self.tmpdir.name, name)
+            dst = os.path.join(self.tmpdir.name, "out_" + name)
+            write_table(self.event_table(unit), src)
+
+            self.assertEqual(annotate_market_seconds(src, dst, calendar), len(self.events))
+            out = read_table(dst)
+            self.assertEqual(out.column_names, ["order_id", "start", "end", "market_seconds"])
+            self.assertEqual(out.column("market_seconds").to_pylist(), expected)
+
+    def test_epoch_column_timezones(self):
+        new_york = ZoneInfo("America/New_York")
+        naive = pa.array([datetime(2024, 3, 11, 9, 30)], type=pa.timestamp("ms"))
+        aware = pa.array([datetime(2024, 3, 11, 13, 30, tzinfo=timezone.utc)], type=pa.timestamp("s", tz="UTC"))
+        expected = int(datetime(2024, 3, 11, 13, 30, tzinfo=timezone.utc).timestamp())
+
+        self.assertEqual(epoch_column(naive, new_york).tolist(), [expected])
+        self.assertEqual(epoch_column(aware, new_york).tolist(), [expected])
+        # Without an exchange tz naive values stay on the wall clock
+        self.assertEqual(epoch_column(naive).tolist(), [expected - 4 * 3600])
+        self.assertEqual(epoch_column(aware).tolist(), [expected])
+        self.assertEqual(epoch_column(pa.array([5, 6])).tolist(), [5, 6])
+
+        with self.assertRaises(TypeError):
+            epoch_column(pa.array(["09:30"]))
+
+    def test_epoch_column_dst_edges(self):
+        new_york = ZoneInfo("America/New_York")
+        # Ambiguous (fall back), nonexistent (spring forward), and their neighbours
+        wall = [datetime(2024, 11, 3, 1, 30), datetime(2024, 11, 3, 2, 30), datetime(2024, 3, 10, 1, 59),
+                datetime(2024, 3, 10, 2, 30), datetime(2024, 3, 10, 3, 0)]
+        expected = [to_epoch_seconds(dt, new_york) for dt in wall]
+        for unit in ("s", "us"):
+            naive = pa.array(wall, type=pa.timestamp(unit))
+            self.assertEqual(epoch_column(naive, new_york).tolist(), expected)
+
+    def test_epoch_column_rejects_nulls_and_fractions(self):
+        with self.assertRaises(ValueError):
+            epoch_column(pa.array([datetime(2024, 7, 1, 9, 30), None], type=pa.timestamp("us")))
+        with self.assertRaises(ValueError):
+            epoch_column(pa.array([datetime(2024, 7, 1, 9, 30, 0, 500)], type=pa.timestamp("us")))
+
+    def test_null_events(self):
+        calendar = TradingCalendar(self.trading_days, self.market_open, self.market_close)
+        expected = get_market_seconds_between_events(self.events, self.trading_days, self.market_open, self.market_close)
+        table = self.event_table("us")
+        starts = table.column("start").to_pylist()
+        ends = table.column("end").to_pylist()
+        starts[1], ends[2] = None, None
+        table = table.set_column(1, "start", pa.array(starts, type=pa.timestamp("us")))
+        table = table.set_column(2, "end", pa.array(ends, type=pa.timestamp("us")))
+
+        src = os.path.join(self.tmpdir.name, "events.parquet")
+        dst = os.path.join(self.tmpdir.name, "out_events.parquet")
+        write_table(table, src)
+        annotate_market_seconds(src, dst, calendar)
+        self.assertEqual(read_table(dst).column("market_seconds").to_pylist(),
+                         [expected[0], None, None, expected[3]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,56 @@
+import asyncio
+import copy
+import multiprocessing
+import random
+import threading
+import time
 import unittest
-from rate_limiter import solve_rate_limiter
+from rate_limiter import (
+    AsyncRateLimiter,
+    ConcurrentRateLimiter,
+    GCRALimiter,
+    InstrumentedRateLimiter,
+    RateLimiterTelemetry,
+    SharedMemoryRateLimiter,
+    SlidingLogLimiter,
+    SlidingWindowCounterLimiter,
+    SpaceSaving,
+    TokenBucketLimiter,
+    solve_rate_limiter,
+    solve_rate_limiter_batch,
+    solve_rate_limiter_reordered,
+)
+
+EXAMPLES = [
+    ([1, 100, 200, 250, 350], 2, 200),
+    ([10, 20, 30, 40], 3, 50),
+    ([1, 2, 3, 10, 11, 12, 20, 21, 22, 23], 2, 5),
+    ([1, 2, 3, 4, 5], 1, 1),
+    ([100], 1, 10),
+    ([1, 2, 3, 4, 5], 2, 1000),
+]
+
+
+def random_timestamps(n, seed=0, max_gap=10):
+    rng = random.Random(seed)
+    t = 0
+    timestamps = []
+    for _ in range(n):
+        t += rng.randint(1, max_gap)
+        timestamps.append(t)
+    return timestamps
+
+_shared_limiter = None
+
+
+def attach_limiter(limiter):
+    global _shared_limiter
+    _shared_limiter = limiter
+
+
+def count_allowed(key, t, attempts):
+    return sum(_shared_limiter.allow(key, t) for _ in range(attempts))
+
 
 class TestRateLimiter(unittest.TestCase):
     def test_example_1(self):
@@ -49,5 +100,265 @@ class TestRateLimiter(unittest.TestCase):
         expected = [True, True, False, False, False]
         self.assertEqual(solve_rate_limiter(timestamps, maxRequests, windowSize), expected)
 
+    def test_batch_matches_solver(self):
+        cases = list(EXAMPLES)
+        # Small maxRequests walks accepts in Python, large ones use NumPy blocks
+        for seed, (maxRequests, windowSize) in enumerate([(1, 7), (3, 25), (40, 100), (64, 90), (200, 150)]):
+            cases.append((random_timestamps(5000, seed=seed, max_gap=seed + 2), maxRequests, windowSize))
+        cases.append(([5, 5, 5, 6, 6, 9], 2, 3))  # Duplicate timestamps
+        cases.append(([1, 2, 3], 0, 10))
+        for timestamps, maxRequests, windowSize in cases:
+            self.assertEqual(solve_rate_limiter_batch(timestamps, maxRequests, windowSize).tolist(),
+                             solve_rate_limiter(timestamps, maxRequests, windowSize))
+
+    def test_reordered_matches_sorted_input(self):
+        rng = random.Random(7)
+        for maxDelay in (0, 3, 20):
+            ordered = random_timestamps(2000, seed=maxDelay, max_gap=3)
+            # Jitter each timestamp back by up to maxDelay; duplicates appear too
+            jittered = [t - rng.randint(0, maxDelay) for t in ordered]
+            newest = float("-inf")
+            for t in jittered:
+                self.assertGreaterEqual(t, newest - maxDelay)
+                newest = max(newest, t)
+
+            order = sorted(range(len(jittered)), key=lambda i: jittered[i])
+            sorted_decisions = solve_rate_limiter([jittered[i] for i in order], 3, 25)
+            expected = [None] * len(jittered)
+            for position, i in enumerate(order):
+                expected[i] = sorted_decisions[position]
+
+            self.assertEqual(solve_rate_limiter_reordered(jittered, 3, 25, maxDelay), expected)
+
+    def test_reordered_rejects_late_requests(self):
+        self.assertEqual(solve_rate_limiter_reordered([10, 8, 9, 10], 2, 5, 2), [False, True, True, False])
+        with self.assertRaises(ValueError):
+            solve_rate_limiter_reordered([10, 20, 17], 2, 5, 2)
+
+    def test_sliding_log_limiter_matches_solver(self):
+        for timestamps, maxRequests, windowSize in EXAMPLES + [(random_timestamps(2000), 5, 40)]:
+            limiter = SlidingLogLimiter(maxRequests, windowSize)
+            self.assertEqual([limiter.allow("key", t) for t in timestamps],
+                             solve_rate_limiter(timestamps, maxRequests, windowSize))
+
+    def test_keys_are_independent(self):
+        timestamps = random_timestamps(3000, seed=1, max_gap=3)
+        rng = random.Random(2)
+        keys = [rng.choice("abc") for _ in timestamps]
+
+        limiter = SlidingLogLimiter(4, 30)
+        decisions = [limiter.allow(key, t) for key, t in zip(keys, timestamps)]
+        for key in "abc":
+            mine = [t for k, t in zip(keys, timestamps) if k == key]
+            expected = solve_rate_limiter(mine, 4, 30)
+            self.assertEqual([d for k, d in zip(keys, decisions) if k == key], expected)
+
+    def test_idle_keys_are_evicted(self):
+        for cls in (SlidingLogLimiter, SlidingWindowCounterLimiter, TokenBucketLimiter, GCRALimiter):
+            limiter = cls(2, 10)
+            for t in range(1000):
+                self.assertTrue(limiter.allow(f"user-{t}", t))
+            # Only keys seen in roughly the last two windows are kept
+            self.assertLessEqual(len(limiter), 21)
+
+    def test_sliding_window_counter(self):
+        # A one-tick window has no previous-bucket overlap, so it is exact
+        for timestamps, maxRequests, _ in EXAMPLES:
+            limiter = SlidingWindowCounterLimiter(maxRequests, 1)
+            self.assertEqual([limiter.allow("key", t) for t in timestamps],
+                             solve_rate_limiter(timestamps, maxRequests, 1))
+
+        limiter = SlidingWindowCounterLimiter(4, 10)
+        # Bucket [0, 9] fills up
+        self.assertEqual([limiter.allow("key", t) for t in (0, 1, 2, 3, 4)], [True] * 4 + [False])
+        # At t=15 the previous bucket still weighs 4 * 4/10 = 1.6
+        self.assertEqual([limiter.allow("key", t) for t in (15, 15, 15, 15)], [True, True, True, False])
+        # At t=19 the previous bucket no longer overlaps the window
+        self.assertEqual([limiter.allow("key", t) for t in (19, 19)], [True, False])
+
+        # Never more than maxRequests within any single bucket
+        limiter = SlidingWindowCounterLimiter(5, 40)
+        timestamps = random_timestamps(2000, seed=3, max_gap=2)
+        decisions = [limiter.allow("key", t) for t in timestamps]
+        per_bucket = {}
+        for t, allowed in zip(timestamps, decisions):
+            per_bucket[t // 40] = per_bucket.get(t // 40, 0) + allowed
+        self.assertLessEqual(max(per_bucket.values()), 5)
+
+    def test_token_bucket(self):
+        limiter = TokenBucketLimiter(3, 30)  # One token every 10 ticks, bursts of 3
+        self.assertEqual(limiter.solve([0, 0, 0, 0, 5, 10, 11, 20, 100, 100, 100, 100]),
+                         [True, True, True, False, False, True, False, True, True, True, True, False])
+
+    def test_gcra(self):
+        limiter = GCRALimiter(3, 30)  # Emission interval 10 ticks, burst of 3
+        self.assertEqual(limiter.solve([0, 0, 0, 0, 5, 10, 11, 20, 100, 100, 100, 100]),
+                         [True, True, True, False, False, True, False, True, True, True, True, False])
+        self.assertEqual(GCRALimiter(0, 10).solve([1, 2]), [False, False])
+
+    def test_algorithms_share_interface(self):
+        timestamps = random_timestamps(3000, seed=4, max_gap=4)
+        for cls in (SlidingLogLimiter, SlidingWindowCounterLimiter, TokenBucketLimiter, GCRALimiter):
+            decisions = cls(5, 50).solve(timestamps)
+            self.assertEqual(len(decisions), len(timestamps))
+            # Every algorithm caps sustained throughput at about maxRequests per window
+            self.assertLessEqual(sum(decisions), 2 * 5 * (timestamps[-1] // 50 + 1))
+        self.assertEqual(SlidingLogLimiter(5, 50).solve(timestamps), solve_rate_limiter(timestamps, 5, 50))
+
+    def test_retry_after(self):
+        timestamps = random_timestamps(400, seed=5, max_gap=3)
+        for cls in (SlidingLogLimiter, SlidingWindowCounterLimiter, TokenBucketLimiter, GCRALimiter):
+            limiter = cls(4, 40)
+            for t in timestamps:
+                wait = limiter.retry_after("key", t)
+                if wait == 0:
+                    continue
+                # Nothing is admitted before the hint...
+                probe = copy.deepcopy(limiter)
+                self.assertFalse(probe.allow("key", t + wait - 1), cls.__name__)
+                # ...and the exact algorithms admit exactly at it
+                if cls is not SlidingWindowCounterLimiter:
+                    probe = copy.deepcopy(limiter)
+                    self.assertTrue(probe.allow("key", t + wait), cls.__name__)
+                limiter.allow("key", t)
+
+    def test_concurrent_limiter(self):
+        limiter = ConcurrentRateLimiter(lambda: SlidingLogLimiter(100, 1000), stripes=8)
+        results = []
+
+        def worker(key):
+            decisions = [limiter.allow(key, 5) for _ in range(200)]
+            results.append((key, sum(decisions)))
+
+        threads = [threading.Thread(target=worker, args=(f"key-{i % 4}",)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        allowed = {}
+        for key, count in results:
+            allowed[key] = allowed.get(key, 0) + count
+        # Exactly the budget per key, no matter how threads interleave
+        self.assertEqual(allowed, {f"key-{i}": 100 for i in range(4)})
+        self.assertFalse(limiter.allow("key-0", 5))
+        self.assertTrue(limiter.allow("key-0"))  # Uses the live clock
+
+    def test_async_acquire_waits(self):
+        limiter = AsyncRateLimiter(SlidingLogLimiter(2, 50))
+
+        async def run():
+            start = time.monotonic()
+            for _ in range(6):
+                await limiter.acquire("host")
+            return time.monotonic() - start
+
+        # Two per 50ms: the 3rd and 5th acquires each wait out a window
+        self.assertGreaterEqual(asyncio.run(run()), 0.09)
+
+    def test_shared_memory_limiter_matches_counter(self):
+        limiter = SharedMemoryRateLimiter(4, 10, slots=64)
+        try:
+            reference = SlidingWindowCounterLimiter(4, 10)
+            timestamps = random_timestamps(2000, seed=6, max_gap=2)
+            rng = random.Random(6)
+            keys = [rng.choice(["alice", "bob", 42]) for _ in timestamps]
+            self.assertEqual([limiter.allow(k, t) for k, t in zip(keys, timestamps)],
+                             [reference.allow(k, t) for k, t in zip(keys, timestamps)])
+        finally:
+            limiter.unlink()
+
+    def test_shared_memory_limiter_full_group(self):
+        limiter = SharedMemoryRateLimiter(1, 10, slots=2, group_size=2)
+        try:
+            # Three keys compete for two slots; every new key still gets a fresh budget
+            self.assertEqual([limiter.allow(k, 0) for k in ("a", "b", "c")], [True] * 3)
+            self.assertFalse(limiter.allow("c", 1))
+        finally:
+            limiter.unlink()
+
+    def test_shared_memory_limiter_across_processes(self):
+        limiter = SharedMemoryRateLimiter(50, 1000)
+        try:
+            with multiprocessing.Pool(4, initializer=attach_limiter, initargs=(limiter,)) as pool:
+                counts = pool.starmap(count_allowed, [("api-key", 7, 40)] * 8)
+            # One host-wide budget, not one per process
+            self.assertEqual(sum(counts), 50)
+            self.assertFalse(limiter.allow("api-key", 7))
+        finally:
+            limiter.unlink()
+
+    def test_solver_telemetry(self):
+        timestamps, maxRequests, windowSize = EXAMPLES[2]
+        telemetry = RateLimiterTelemetry()
+        self.assertEqual(solve_rate_limiter(timestamps, maxRequests, windowSize, telemetry=telemetry),
+                         solve_rate_limiter(timestamps, maxRequests, windowSize))
+        snapshot = telemetry.snapshot()
+        self.assertEqual((snapshot["accepted"], snapshot["rejected"]), (6, 4))
+        self.assertEqual(snapshot["per_key"], {None: {"accepted": 6, "rejected": 4}})
+        self.assertEqual(snapshot["latency"]["count"], 10)
+
+    def test_instrumented_limiter_hot_keys(self):
+        telemetry = RateLimiterTelemetry(top_k=3)
+        limiter = InstrumentedRateLimiter(SlidingLogLimiter(1, 100), telemetry)
+        rng = random.Random(8)
+        for t in range(5000):
+            # "hot" is hammered, everyone else shows up occasionally
+            key = "hot" if rng.random() < 0.5 else f"user-{rng.randrange(500)}"
+            limiter.allow(key, t)
+
+        snapshot = telemetry.snapshot()
+        self.assertEqual(snapshot["top_throttled"][0]["key"], "hot")
+        self.assertEqual(snapshot["rejected"], sum(v["rejected"] for v in snapshot["per_key"].values()))
+        self.assertLessEqual(snapshot["latency"]["p50_ns"], snapshot["latency"]["p99_ns"])
+
+    def test_space_saving(self):
+        sketch = SpaceSaving(2)
+        for key in "aaaabbbd":
+            sketch.add(key)
+        # 'd' took over the smallest counter; its count may be overestimated by that floor
+        self.assertEqual(sketch.top(), [("a", 4, 0), ("d", 4, 3)])
+
+        # Guarantees hold on a skewed stream: exact total, bounded error, heavy hitters kept
+        rng = random.Random(3)
+        sketch = SpaceSaving(20)
+        true = {}
+        for _ in range(20_000):
+            key = int(rng.paretovariate(1.2)) % 1000
+            true[key] = true.get(key, 0) + 1
+            sketch.add(key)
+        top = sketch.top()
+        self.assertEqual(len(top), 20)
+        self.assertEqual(sum(count for _, count, _ in top), 20_000)
+        for key, count, error in top:
+            self.assertLessEqual(count - error, true.get(key, 0))
+            self.assertLessEqual(true.get(key, 0), count)
+        tracked = {key for key, _, _ in top}
+        self.assertTrue(all(key in tracked for key, n in true.items() if n > 20_000 / 20))
+
+    def test_space_saving_decays(self):
+        sketch = SpaceSaving(4, decay_every=100)
+        for _ in range(1_000):
+            sketch.add("old")
+        for _ in range(300):
+            sketch.add("new")
+        # After three halvings "old" has faded below the recent key
+        self.assertEqual(sketch.top(1)[0][0], "new")
+        self.assertLessEqual(sketch.top()[1][1], 1_000 >> 3)
+        for _ in range(1_000):
+            sketch.add("newest")
+        self.assertEqual([key for key, _, _ in sketch.top()], ["newest"])
+
+    def test_telemetry_memory_is_bounded(self):
+        telemetry = RateLimiterTelemetry(top_k=5, max_keys=100)
+        limiter = InstrumentedRateLimiter(TokenBucketLimiter(1, 1_000), telemetry)
+        for t in range(10_000):
+            limiter.allow(f"key-{t % 5_000}", t)
+        snapshot = telemetry.snapshot()
+        self.assertEqual(len(snapshot["per_key"]), 100)
+        self.assertIn("key-4999", snapshot["per_key"])
+        self.assertEqual(snapshot["accepted"] + snapshot["rejected"], 10_000)
+        self.assertLessEqual(len(snapshot["top_throttled"]), 5)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+import math
+import random
+import unittest
+from timing_wheel import HierarchicalTimingWheel
+
+class TestHierarchicalTimingWheel(unittest.TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        # 4 slots x 3 levels reaches 64 ticks, so plenty of timers overflow
+        wheel = HierarchicalTimingWheel(tick=0.5, slots=4, levels=3, start=100.0)
+        deadlines = {}
+        now = 100.0
+        for step in range(3_000):
+            op = rng.random()
+            key = rng.randrange(200)
+            if op < 0.5:
+                expires_at = now + rng.choice((0.1, 1, 7, 40, 200)) * rng.random()
+                wheel.schedule(key, expires_at)
+                deadlines[key] = expires_at
+            elif op < 0.6:
+                self.assertEqual(wheel.cancel(key), deadlines.pop(key, None) is not None)
+            else:
+                now += rng.choice((0.2, 1.0, 3.0, 50.0))
+                expired = wheel.advance(now)
+                # Rounded up to whole ticks: due once the tick holding the deadline has passed
+                due = {k for k, t in deadlines.items() if math.ceil((t - 100.0) / 0.5) * 0.5 + 100.0 <= now}
+                self.assertEqual(set(expired), due)
+                self.assertEqual(len(expired), len(due))
+                for k in due:
+                    del deadlines[k]
+            self.assertEqual(len(wheel), len(deadlines))
+
+    def test_never_early(self):
+        wheel = HierarchicalTimingWheel(tick=1.0, start=0.0)
+        wheel.schedule("a", 10.2)
+        wheel.schedule("b", 5.0)
+        self.assertEqual(wheel.advance(4.99), [])
+        self.assertEqual(wheel.advance(5.0), ["b"])
+        self.assertEqual(wheel.next_deadline, 6.0)
+        self.assertEqual(wheel.advance(10.9), [])
+        self.assertEqual(wheel.advance(11.0), ["a"])
+
+        # Rescheduling replaces the timer; the past goes to the next tick
+        wheel.schedule("c", 20.0)
+        wheel.schedule("c", 1.0)
+        self.assertEqual(wheel.advance(12.0), ["c"])
+        self.assertNotIn("c", wheel)
+
+    def test_long_idle_jump(self):
+        wheel = HierarchicalTimingWheel(tick=1.0, slots=8, levels=2, start=0.0)
+        for i in range(100):
+            wheel.schedule(i, 1_000 + i)
+        self.assertEqual(wheel.advance(1_049), list(range(50)))
+        self.assertEqual(wheel.advance(1e6), list(range(50, 100)))
+        self.assertEqual(len(wheel), 0)
+
+    def test_idle_stretches_are_skipped(self):
+        # A billion ticks, walked one by one, would take minutes
+        wheel = HierarchicalTimingWheel(tick=1.0, slots=64, levels=4, start=0.0)
+        wheel.schedule("far", 1e9)
+        wheel.schedule("near", 100)
+        self.assertEqual(wheel.advance(1e9 - 1), ["near"])
+        self.assertEqual(wheel.advance(1e9), ["far"])
+        self.assertEqual(wheel._counts, [0, 0, 0, 0])
+        wheel.schedule("next", 1e9 + 0.5)
+        self.assertEqual(wheel.advance(1e9 + 1), ["next"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import math
+import time
+
+
+class HierarchicalTimingWheel:
+    """
+    Hierarchical timing wheel (Varghese & Lauck) for expiring many keys.
+
+    Level 0 has one bucket per tick, level 1 one per slots ticks, level i one
+    per slots**i ticks. A timer lands in the lowest level whose span covers
+    its delay, and when the wheel reaches a higher-level bucket the timers in
+    it cascade down a level. schedule() and cancel() are O(1) and each timer
+    cascades at most levels - 1 times, so advancing costs O(1) per tick plus
+    O(1) per expired timer, however many timers are pending. Ticks with
+    nothing to expire or cascade are skipped a bucket at a time, so a long
+    idle stretch costs O(levels) per top-level bucket rather than per tick.
+    Timers further out than slots**levels ticks wait in the top level and
+    re-cascade.
+
+    One timer per key: scheduling a key again replaces its timer. Deadlines
+    are rounded up to whole ticks, so a key is reported expired at most one
+    tick late and never early.
+
+    Args:
+        tick: Seconds per tick (the resolution).
+        slots: Buckets per level.
+        levels: Number of levels.
+        start: Time of tick 0 (default: time.time()).
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 4, start: float = None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.start = time.time() if start is None else start
+        self._now = 0  # Ticks processed so far
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._spans = [slots ** level for level in range(levels + 1)]
+        self._where = {}  # key -> (level, the bucket dict holding it)
+        self._counts = [0] * levels  # Timers per level
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    @property
+    def next_deadline(self) -> float:
+        """The time at which advance() next has a tick to process."""
+        return self.start + (self._now + 1) * self.tick
+
+    def schedule(self, key, expires_at: float):
+        """Sets key to expire at expires_at, replacing any earlier timer for it."""
+        self.cancel(key)
+        due = max(math.ceil((expires_at - self.start) / self.tick), self._now + 1)
+        self._place(key, due)
+
+    def _place(self, key, due):
+        delay = due - self._now
+        spans = self._spans
+        level = 0
+        while level < self.levels - 1 and delay >= spans[level + 1]:
+            level += 1
+        if delay >= spans[level + 1]:
+            # Beyond the top level's reach: park in its last bucket and re-cascade from there
+            slot = (self._now // spans[level] + self.slots - 1) % self.slots
+        else:
+            slot = (due // spans[level]) % self.slots
+        bucket = self._wheels[level][slot]
+        bucket[key] = due
+        self._where[key] = (level, bucket)
+        self._counts[level] += 1
+
+    def cancel(self, key) -> bool:
+        """Removes key's timer. Returns whether it had one."""
+        entry = self._where.pop(key, None)
+        if entry is None:
+            return False
+        level, bucket = entry
+        del bucket[key]
+        self._counts[level] -= 1
+        return True
+
+    def advance(self, now: float = None) -> list:
+        """
+        Moves the wheel forward to now.
+
+        Returns:
+            The keys whose deadlines have passed, oldest tick first.
+        """
+        now = time.time() if now is None else now
+        target = math.floor((now - self.start) / self.tick)
+        expired = []
+        if not self._where:
+            self._now = max(self._now, target)
+            return expired
+
+        slots, spans, wheels, where, counts = self.slots, self._spans, self._wheels, self._where, self._counts
+        while self._now < target and where:
+            if not counts[0]:
+                # Nothing can expire or cascade before the next bucket boundary
+                # of the lowest level holding timers: jump to it
+                level = 1
+                while not counts[level]:
+                    level += 1
+                span = spans[level]
+                self._now = min((self._now // span + 1) * span, target) - 1
+            self._now += 1
+            t = self._now
+            # Cascade every level whose bucket boundary this tick crosses
+            for level in range(1, self.levels):
+                if t % spans[level]:
+                    break
+                bucket = wheels[level][(t // spans[level]) % slots]
+                if bucket:
+                    entries = list(bucket.items())
+                    bucket.clear()
+                    counts[level] -= len(entries)
+                    for key, due in entries:
+                        self._place(key, due)
+
+            bucket = wheels[0][t % slots]
+            if bucket:
+                for key, due in list(bucket.items()):
+                    if due <= t:
+                        del bucket[key]
+                        del where[key]
+                        counts[0] -= 1
+                        expired.append(key)
+        self._now = max(self._now, target)
+        return expired